@@ -0,0 +1,163 @@
+import os
+import shutil
+import hashlib
+import tempfile
+import numpy as np
+
+# Changes whenever computeMAT computes different MATs for the same input, so that older
+# cache entries are no longer found
+MAT_CACHE_VERSION = 4
+
+
+def MATcacheKey(binaryImage, threshold_angle, number_of_samples, **options):
+    """
+    Computes the key of a MAT in the on-disk cache.
+
+    The key is a SHA-256 hash of the binary image (its shape, dtype and pixel values),
+    the threshold angle, the number of sample points on the sphere and any further
+    options that change the result of computeMAT, as well as MAT_CACHE_VERSION.
+
+    Args:
+        binaryImage (numpy.ndarray): The 2D binary image the MAT is computed from.
+        threshold_angle (float): Threshold on the object angle in degrees.
+        number_of_samples (int): The number of sample points used for the average outward flux.
+        **options: Further settings that influence the MAT, e.g. headless=True.
+
+    Returns:
+        str: The hexadecimal cache key.
+
+    -----------------------------------------------------
+    This function is part of the Mid Level Vision Toolbox:
+    http://www.mlvtoolbox.org
+
+    Python Implementation: Aravind Narayanan
+    Original MATLAB Implementation: Dirk Bernhardt-Walther
+    Copyright: Dirk Bernhardt-Walther
+    University of Toronto, Toronto, Ontario, Canada, 2024
+
+    Contact: dirk.walther@gmail.com
+    -----------------------------------------------------
+    """
+    binaryImage = np.ascontiguousarray(binaryImage)
+    h = hashlib.sha256()
+    h.update(repr((MAT_CACHE_VERSION, binaryImage.shape, binaryImage.dtype.str, float(threshold_angle),
+                   int(number_of_samples), sorted(options.items()))).encode())
+    h.update(binaryImage.data)
+    return h.hexdigest()
+
+
+def loadMATfromCache(cacheDir, key):
+    """
+    Loads a MAT from the on-disk cache.
+
+    The distance map and the flux image are memory-mapped read-only, the bit-packed
+    skeleton is unpacked into memory. A hit marks the entry as most recently used.
+
+    Args:
+        cacheDir (str): The cache directory.
+        key (str): The cache key as computed by MATcacheKey.
+
+    Returns:
+        dict or None: A dictionary with the fields 'skeleton', 'distance_map' and 'AOF',
+        or None if the cache holds no MAT for this key.
+
+    -----------------------------------------------------
+    This function is part of the Mid Level Vision Toolbox:
+    http://www.mlvtoolbox.org
+
+    Python Implementation: Aravind Narayanan
+    Original MATLAB Implementation: Dirk Bernhardt-Walther
+    Copyright: Dirk Bernhardt-Walther
+    University of Toronto, Toronto, Ontario, Canada, 2024
+
+    Contact: dirk.walther@gmail.com
+    -----------------------------------------------------
+    """
+    entry = os.path.join(cacheDir, key)
+    if not os.path.isdir(entry):
+        return None
+    try:
+        mat = {}
+        mat['distance_map'] = np.load(os.path.join(entry, 'distance_map.npy'), mmap_mode='r')
+        mat['AOF'] = np.load(os.path.join(entry, 'AOF.npy'), mmap_mode='r')
+        packed = np.load(os.path.join(entry, 'skeleton.npy'))
+        shape = mat['AOF'].shape
+        mat['skeleton'] = np.unpackbits(packed, count=shape[0] * shape[1]).reshape(shape).astype(bool)
+    except (OSError, ValueError):
+        # Entry was evicted or is incomplete
+        return None
+    os.utime(entry)
+    return mat
+
+
+def saveMATtoCache(cacheDir, key, mat, maxCacheBytes=None):
+    """
+    Stores a MAT in the on-disk cache and evicts the least recently used entries
+    if the cache grows beyond maxCacheBytes.
+
+    The skeleton is stored bit-packed (one bit per pixel), the distance map and the flux
+    image as uncompressed .npy files so that they can be memory-mapped on read. Entries are
+    written to a temporary directory first and then renamed, so that concurrent readers
+    never see partial entries.
+
+    Args:
+        cacheDir (str): The cache directory. It is created if it does not exist.
+        key (str): The cache key as computed by MATcacheKey.
+        mat (dict): The MAT with the fields 'skeleton', 'distance_map' and 'AOF'.
+        maxCacheBytes (int, optional): The size limit of the cache in bytes. Default is None (no limit).
+
+    -----------------------------------------------------
+    This function is part of the Mid Level Vision Toolbox:
+    http://www.mlvtoolbox.org
+
+    Python Implementation: Aravind Narayanan
+    Original MATLAB Implementation: Dirk Bernhardt-Walther
+    Copyright: Dirk Bernhardt-Walther
+    University of Toronto, Toronto, Ontario, Canada, 2024
+
+    Contact: dirk.walther@gmail.com
+    -----------------------------------------------------
+    """
+    os.makedirs(cacheDir, exist_ok=True)
+    entry = os.path.join(cacheDir, key)
+    if not os.path.isdir(entry):
+        tmpEntry = tempfile.mkdtemp(dir=cacheDir, prefix='.tmp-')
+        try:
+            np.save(os.path.join(tmpEntry, 'distance_map.npy'), np.asarray(mat['distance_map']))
+            np.save(os.path.join(tmpEntry, 'AOF.npy'), np.asarray(mat['AOF']))
+            np.save(os.path.join(tmpEntry, 'skeleton.npy'), np.packbits(np.asarray(mat['skeleton'], dtype=bool)))
+            os.rename(tmpEntry, entry)
+        except OSError:
+            # Another process stored the same entry in the meantime
+            shutil.rmtree(tmpEntry, ignore_errors=True)
+    if os.path.isdir(entry):
+        os.utime(entry)
+
+    if maxCacheBytes is not None:
+        evictMATcache(cacheDir, maxCacheBytes, keep=key)
+
+
+def evictMATcache(cacheDir, maxCacheBytes, keep=None):
+    """
+    Removes the least recently used entries from the MAT cache until its total size is at
+    most maxCacheBytes. The entry named keep is never removed.
+    """
+    entries = []
+    total = 0
+    for name in os.listdir(cacheDir):
+        entry = os.path.join(cacheDir, name)
+        if name.startswith('.') or not os.path.isdir(entry):
+            continue
+        try:
+            size = sum(f.stat().st_size for f in os.scandir(entry))
+            entries.append((os.stat(entry).st_mtime, size, name))
+        except OSError:
+            continue
+        total += size
+    for _, size, name in sorted(entries):
+        if total <= maxCacheBytes:
+            break
+        if name == keep:
+            continue
+        shutil.rmtree(os.path.join(cacheDir, name), ignore_errors=True)
+        total -= size
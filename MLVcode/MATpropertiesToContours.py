@@ -1,5 +1,4 @@
 import numpy as np
-import cv2
 
 def MATpropertiesToContours(vecLD, MATpropertyImage, property):
     """
@@ -13,6 +12,11 @@ def MATpropertiesToContours(vecLD, MATpropertyImage, property):
 
     Returns:
         dict: The updated vecLD data structure with MAT properties mapped to each contour.
+
+    Notes:
+    - The pixels of all contours are listed once (see rasterizeContours). The scores of all
+      pixels are gathered from MATpropertyImage at once, and the means per contour are
+      computed by grouping these scores by contour.
     
     -----------------------------------------------------
     This function is part of the Mid Level Vision Toolbox:
@@ -28,59 +32,121 @@ def MATpropertiesToContours(vecLD, MATpropertyImage, property):
     """
 
     # Define a vector for scaling the coordinates up or down as needed
-    # MATpropertyImage = np.transpose(MATpropertyImage) 
     imsize = (MATpropertyImage.shape[0], MATpropertyImage.shape[1])
-    # print("Image Size: ",imsize)
     scaleVec = (imsize[1] / vecLD['imsize'][0][0], imsize[0] / vecLD['imsize'][0][1])
-    # scaleVec = (vecLD['imsize'][0][1] / imsize[0], vecLD['imsize'][0][0] / imsize[1])
     scaleVec = np.array([scaleVec, scaleVec]).flatten()
-    # print("Scale Vector: ",scaleVec)
-    vecLD[property] = np.zeros(vecLD['numContours'][0][0], dtype=object)
-    allMeans = np.zeros(vecLD['numContours'][0][0])
+    numContours = vecLD['numContours'][0][0]
 
-    # Collect all scores for the entire image
-    allInd = []
-    allProp = []
+    # The pixels of all contours, one contour after the other
+    Y, X, contourStarts = rasterizeContours(vecLD, scaleVec, imsize)
 
-    for c in range(vecLD['numContours']):
-        img = np.zeros(imsize, dtype=np.uint8)
-        scaledCoords = np.array(vecLD['contours'][0][c]) * scaleVec
-        # Convert scaledCoords into format expected by cv2.polylines or cv2.line
-        scaledCoords = scaledCoords.reshape((-1, 1, 2)).astype(np.int32)
+    # Gather the scores of all contour pixels at once
+    allProp = MATpropertyImage[Y, X].astype(float)
+    validProp = (allProp != 0)
+    allProp[~validProp] = np.nan
 
-        # Drawing lines on the image
-        img = cv2.polylines(img, [scaledCoords], isClosed=False, color=(255,), thickness=1)
+    # Means of the valid scores of every contour
+    contourOf = np.repeat(np.arange(numContours), np.diff(contourStarts))
+    sums = np.bincount(contourOf[validProp], weights=allProp[validProp], minlength=numContours)
+    counts = np.bincount(contourOf[validProp], minlength=numContours)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        allMeans = np.where(counts > 0, sums / counts, np.nan)
 
-        # Finding indices where img > 0
-        thisInd = np.where(img > 0)
-        thisProp = MATpropertyImage[thisInd].flatten()
-        validProp = (thisProp != 0)
+    # Updating vecLD with properties for every contour, shaped (1, numContours) like vecLD['contours']
+    vecLD[property] = np.empty((1, numContours), dtype=object)
+    for c in range(numContours):
+        vecLD[property][0][c] = allProp[contourStarts[c]:contourStarts[c + 1]]
 
-        # Calculating mean of valid properties
-        allMeans[c] = np.mean(thisProp[validProp]) if np.any(validProp) else np.nan
-        thisProp[~validProp] = np.nan
+    # Update vecLD with the means for each contour property
+    vecLD[f'{property}Means'] = allMeans
 
-        # Updating vecLD with properties for this contour
-        if property not in vecLD:
-            vecLD[property] = []
-        vecLD[property].append(thisProp)
+    # Update vecLD with X, Y coordinates and all property scores
+    vecLD[f'{property}_allX'] = X[validProp]
+    vecLD[f'{property}_allY'] = Y[validProp]
+    vecLD[f'{property}_allScores'] = allProp[validProp]
 
-        # Accumulating indices and properties
-        allInd.extend(thisInd[0][validProp])
-        allProp.extend(thisProp[validProp])
+    return vecLD
 
-    # Assuming imsize is defined somewhere in your code, e.g., imsize = (height, width)
-    # Assuming allInd, allMeans, and allProp are already defined from previous operations
 
-    # Update vecLD with the means for each contour property
-    vecLD[f'{property}Means'] = allMeans
+def rasterizeContours(vecLD, scaleVec, imsize):
+    """
+    Lists the pixels of all contours of a line drawing, as drawn by cv2.polylines.
 
-    # Convert linear indices (allInd) to subscript indices
-    Y, X = np.unravel_index(allInd, imsize)
+    The line segments of all contours are scaled and truncated to pixels in one go, like in
+    getScaledSegments of renderLineDrawing, and the pixels of all of them are enumerated at
+    once (see getLinePixels) instead of drawing every contour into an image of its own. The
+    pixels are then grouped by contour. Pixels where several contours overlap are listed for
+    each of these contours.
 
-    # Update vecLD with X, Y coordinates and all property scores
-    vecLD[f'{property}_allX'] = X
-    vecLD[f'{property}_allY'] = Y
-    vecLD[f'{property}_allScores'] = allProp
+    Args:
+        vecLD (dict): The vectorized line drawings data structure.
+        scaleVec (numpy.ndarray): The scale factors for the x1, y1, x2 and y2 coordinates.
+        imsize (tuple): The (height, width) of the image the contours are drawn into.
+
+    Returns:
+        tuple: A tuple (Y, X, contourStarts) where:
+            Y (numpy.ndarray): The row of every contour pixel, in row-major order per contour.
+            X (numpy.ndarray): The column of every contour pixel.
+            contourStarts (numpy.ndarray): An int64 array with one more entry than there are
+            contours. Contour c consists of the pixels contourStarts[c]:contourStarts[c+1].
+    """
+    numContours = vecLD['numContours'][0][0]
+    contours = [np.asarray(c, dtype=float).reshape((-1, 4)) for c in vecLD['contours'][0][:numContours]]
+    numSegments = np.array([len(c) for c in contours], dtype=np.int64)
+    if numSegments.sum() == 0:
+        return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp), np.zeros(numContours + 1, dtype=np.int64)
+    segments = (np.concatenate(contours) * scaleVec).astype(np.int32).astype(np.int64)
+    segmentContour = np.repeat(np.arange(numContours), numSegments)
+
+    # cv2.polylines also connects the end of every segment to the start of the next one
+    isJoin = segmentContour[:-1] == segmentContour[1:]
+    joins = np.concatenate((segments[:-1][isJoin, 2:], segments[1:][isJoin, :2]), axis=1)
+    lines = np.concatenate((segments, joins))
+    lineContour = np.concatenate((segmentContour, segmentContour[:-1][isJoin]))
+
+    # Pixels of all lines, made unique and in row-major order per contour
+    Y, X, lineOf = getLinePixels(lines)
+    inside = (Y >= 0) & (Y < imsize[0]) & (X >= 0) & (X < imsize[1])
+    contourOf, Y, X = lineContour[lineOf[inside]], Y[inside], X[inside]
+    pixelKey = np.unique((contourOf * imsize[0] + Y) * imsize[1] + X)
+    contourOf, pixel = np.divmod(pixelKey, imsize[0] * imsize[1])
+    Y, X = np.divmod(pixel, imsize[1])
+    contourStarts = np.searchsorted(contourOf, np.arange(numContours + 1)).astype(np.int64)
+    return Y.astype(np.intp), X.astype(np.intp), contourStarts
+
+
+def getLinePixels(lines):
+    """
+    Enumerates the pixels of 8-connected lines between integer end points, for all lines at
+    once. The pixels are those that cv2.line draws with a thickness of 1: the line is traced
+    from its left end point with the integer Bresenham algorithm of OpenCV's LineIterator.
 
-    return vecLD
\ No newline at end of file
+    Args:
+        lines (numpy.ndarray): An (L, 4) integer array of x1, y1, x2, y2.
+
+    Returns:
+        tuple: A tuple (Y, X, lineOf) with the row and column of every pixel and the index of
+        the line it belongs to.
+    """
+    x1, y1, x2, y2 = lines.T
+    swap = x2 < x1
+    x1, x2 = np.where(swap, x2, x1), np.where(swap, x1, x2)
+    y1, y2 = np.where(swap, y2, y1), np.where(swap, y1, y2)
+    dx = x2 - x1
+    dy = np.abs(y2 - y1)
+    stepY = np.where(y2 < y1, -1, 1)
+    steep = dy > dx
+    major = np.where(steep, dy, dx)
+    minor = np.where(steep, dx, dy)
+
+    # Step k along the major axis, and the number of steps taken along the minor axis by then
+    counts = major + 1
+    lineOf = np.repeat(np.arange(len(lines)), counts)
+    k = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    major, minor = major[lineOf], minor[lineOf]
+    m = -((major - 2 * minor * k) // np.maximum(2 * major, 1))
+
+    steep = steep[lineOf]
+    X = x1[lineOf] + np.where(steep, m, k)
+    Y = y1[lineOf] + stepY[lineOf] * np.where(steep, k, m)
+    return Y, X, lineOf
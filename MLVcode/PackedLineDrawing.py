@@ -0,0 +1,252 @@
+import numpy as np
+
+# The per-segment properties of a vecLD, with one value per line segment of every contour
+SEGMENT_PROPERTIES = ('orientations', 'lengths', 'curvatures')
+
+
+class PackedLineDrawing:
+    """
+    A vectorized line drawing with all line segments in one contiguous array.
+
+    The line segments of all contours are stored one after the other in the (S, 4) float array
+    segments, with the columns x1, y1, x2, y2; contour c covers
+    segments[contourStarts[c]:contourStarts[c+1]]. The per-segment properties (orientations,
+    lengths, curvatures) are stored as columns of S values aligned with segments. Vectorized
+    code can thus work on all segments of a drawing at once, and use contourStarts (or
+    contourOfSegment) wherever the contours matter.
+
+    A PackedLineDrawing is converted from and to the dict form of a vecLD without loss (see
+    fromVecLD and toVecLD): the nesting of the per-contour fields, the shapes and types of
+    their elements, and all other fields of the dict are kept as they are.
+
+    Attributes:
+        segments (numpy.ndarray): The (S, 4) float64 array of all line segments.
+        contourStarts (numpy.ndarray): int64 offsets of the contours into segments, one more than numContours.
+        segmentProperties (dict): The per-segment property columns, each a float64 array of S values.
+        fields (dict): All other fields of the vecLD (originalImage, imsize, junctions, ...), unchanged.
+        layouts (dict): For contours and each per-segment property that came from a vecLD, how
+            it was nested (see toVecLD).
+
+    -----------------------------------------------------
+    This function is part of the Mid Level Vision Toolbox:
+    http://www.mlvtoolbox.org
+
+    Python Implementation: Aravind Narayanan
+    Original MATLAB Implementation: Dirk Bernhardt-Walther
+    Copyright: Dirk Bernhardt-Walther
+    University of Toronto, Toronto, Ontario, Canada, 2024
+
+    Contact: dirk.walther@gmail.com
+    -----------------------------------------------------
+    """
+
+    def __init__(self, segments, contourStarts, segmentProperties=None, fields=None):
+        """
+        Creates a packed line drawing from its segments and contour offsets.
+
+        Args:
+            segments (array_like): The (S, 4) line segments x1, y1, x2, y2 of all contours.
+            contourStarts (array_like): The offsets of the contours into segments, one more than there are contours.
+            segmentProperties (dict, optional): Per-segment property columns of S values each. Default is None.
+            fields (dict, optional): Other fields of the drawing, such as 'imsize'. Default is None.
+
+        Raises:
+            ValueError: If the offsets or the property columns do not match the segments.
+        """
+        self.segments = np.asarray(segments, dtype=np.float64).reshape((-1, 4))
+        self.contourStarts = np.asarray(contourStarts, dtype=np.int64)
+        if (self.contourStarts.ndim != 1 or len(self.contourStarts) == 0 or self.contourStarts[0] != 0
+                or self.contourStarts[-1] != len(self.segments) or np.any(np.diff(self.contourStarts) < 0)):
+            raise ValueError('contourStarts has to rise from 0 to the number of segments')
+        self.segmentProperties = {}
+        for name, values in (segmentProperties or {}).items():
+            self.setSegmentProperty(name, values)
+        self.fields = dict(fields or {})
+        self.layouts = {}
+
+    @property
+    def numContours(self):
+        return len(self.contourStarts) - 1
+
+    @property
+    def numSegments(self):
+        return len(self.segments)
+
+    def contourSlice(self, c):
+        """
+        Returns the slice of contour c into segments and the property columns.
+        """
+        return slice(self.contourStarts[c], self.contourStarts[c + 1])
+
+    def contour(self, c):
+        """
+        Returns the (S_c, 4) segments of contour c as a view into segments.
+        """
+        return self.segments[self.contourSlice(c)]
+
+    def segmentCounts(self):
+        """
+        Returns the number of segments of every contour.
+        """
+        return np.diff(self.contourStarts)
+
+    def contourOfSegment(self):
+        """
+        Returns the contour of every segment.
+        """
+        return np.repeat(np.arange(self.numContours, dtype=np.int64), self.segmentCounts())
+
+    def segmentInContour(self):
+        """
+        Returns the position of every segment within its contour.
+        """
+        return np.arange(self.numSegments, dtype=np.int64) - np.repeat(self.contourStarts[:-1], self.segmentCounts())
+
+    def setSegmentProperty(self, name, values):
+        """
+        Sets the per-segment property column name to values, one per segment.
+        """
+        values = np.asarray(values, dtype=np.float64).ravel()
+        if len(values) != self.numSegments:
+            raise ValueError('The property %s has %d values for %d segments' % (name, len(values), self.numSegments))
+        self.segmentProperties[name] = values
+        self.layouts.pop(name, None)
+
+    @classmethod
+    def fromVecLD(cls, vecLD):
+        """
+        Packs a vecLD dict into a PackedLineDrawing.
+
+        The contours and the per-segment properties in SEGMENT_PROPERTIES are packed into
+        columns; all other fields are kept in fields as they are. A per-segment property that
+        does not have one value per segment is kept in fields as well.
+
+        Args:
+            vecLD (dict): The vectorized line drawing data structure.
+
+        Returns:
+            PackedLineDrawing: The packed line drawing.
+        """
+        contours, layout = unpackContainer(vecLD['contours'])
+        numContours = len(contours)
+        allSegments, contourStarts = packContours(contours)
+        counts = np.diff(contourStarts)
+
+        fields = {name: value for name, value in vecLD.items()
+                  if name != 'contours' and name not in SEGMENT_PROPERTIES}
+        packed = cls(allSegments, contourStarts, fields=fields)
+        packed.layouts['contours'] = layout + (elementLayouts(contours),)
+
+        for name in SEGMENT_PROPERTIES:
+            if name not in vecLD:
+                continue
+            elements, layout = unpackContainer(vecLD[name])
+            sizes = [np.size(e) for e in elements]
+            # Single segment contours may carry a bare number
+            if len(elements) != numContours or np.any(np.array(sizes, dtype=np.int64) != counts):
+                packed.fields[name] = vecLD[name]
+                continue
+            values = np.concatenate([np.asarray(e, dtype=np.float64).ravel() for e in elements]) \
+                if numContours > 0 else np.zeros(0)
+            packed.setSegmentProperty(name, values)
+            packed.layouts[name] = layout + (elementLayouts(elements),)
+        return packed
+
+    def toVecLD(self):
+        """
+        Unpacks the drawing into a vecLD dict.
+
+        The contours and the per-segment properties that came from a vecLD are nested as they
+        were there. Properties that were set later become (1, numContours) object arrays of
+        flat per-contour arrays, like the contours of a vecLD loaded from a .mat file.
+
+        Returns:
+            dict: The vectorized line drawing data structure.
+        """
+        vecLD = dict(self.fields)
+        if 'numContours' not in vecLD or np.asarray(vecLD['numContours']).ravel()[0] != self.numContours:
+            vecLD['numContours'] = np.array([[self.numContours]])
+        columns = [('contours', self.segments)] + list(self.segmentProperties.items())
+        for name, values in columns:
+            elements = [values[self.contourSlice(c)] for c in range(self.numContours)]
+            layout = self.layouts.get(name)
+            if layout is not None and len(layout[2]) == self.numContours:
+                kind, shape, elementLayout = layout
+                elements = [restoreElement(e, l) for e, l in zip(elements, elementLayout)]
+            else:
+                kind, shape = 'ndarray', (1, self.numContours)
+                elements = [e.copy() for e in elements]
+            vecLD[name] = packContainer(elements, kind, shape)
+        return vecLD
+
+
+def packContours(contours, width=4):
+    """
+    Concatenates the (S_c, 4) segment arrays of a list of contours, or with width=1 the
+    per-segment values of a per-contour property.
+
+    Returns:
+        tuple: A tuple (segments, contourStarts) with the (S, width) float64 array of all segments
+        and the int64 offsets of the contours into it, one more than there are contours.
+    """
+    segments = [np.asarray(c, dtype=np.float64).reshape((-1, width)) for c in contours]
+    contourStarts = np.zeros(len(segments) + 1, dtype=np.int64)
+    np.cumsum([len(s) for s in segments], out=contourStarts[1:])
+    if len(segments) == 0:
+        return np.zeros((0, width)), contourStarts
+    return np.concatenate(segments), contourStarts
+
+
+def unpackContainer(container):
+    """
+    Returns the per-contour elements of a vecLD field and the layout (kind, shape) of their
+    container: an object array ('ndarray'), a list ('list') or a list wrapped in another
+    list, as computeLength creates it ('nestedList').
+    """
+    if isinstance(container, np.ndarray):
+        return list(container.ravel()), ('ndarray', container.shape)
+    if len(container) == 1 and isinstance(container[0], list) \
+            and all(isinstance(e, (np.ndarray, list)) for e in container[0]):
+        return list(container[0]), ('nestedList', None)
+    return list(container), ('list', None)
+
+
+def packContainer(elements, kind, shape):
+    """
+    Nests per-contour elements in a container of the layout (kind, shape), see unpackContainer.
+    """
+    if kind == 'ndarray':
+        container = np.empty(len(elements), dtype=object)
+        for c, element in enumerate(elements):
+            container[c] = element
+        return container.reshape(shape)
+    if kind == 'nestedList':
+        return [list(elements)]
+    return list(elements)
+
+
+def elementLayouts(elements):
+    """
+    Returns the layout of every per-contour element: ('ndarray', shape, dtype) for arrays,
+    ('list', item types) for lists of numbers and ('number', type) for bare numbers.
+    """
+    layouts = []
+    for element in elements:
+        if isinstance(element, np.ndarray):
+            layouts.append(('ndarray', element.shape, element.dtype))
+        elif isinstance(element, list):
+            layouts.append(('list', [type(item) for item in element]))
+        else:
+            layouts.append(('number', type(element)))
+    return layouts
+
+
+def restoreElement(values, layout):
+    """
+    Gives the packed values of one contour the layout of the element they came from.
+    """
+    if layout[0] == 'ndarray':
+        return values.reshape(layout[1]).astype(layout[2])
+    if layout[0] == 'list':
+        return [itemType(value) for itemType, value in zip(layout[1], values)]
+    return layout[1](values[0])
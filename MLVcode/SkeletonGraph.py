@@ -0,0 +1,232 @@
+import numpy as np
+from scipy import sparse
+from skimage import morphology
+from MLVcode.traceSkeleton import traceSkeletonPixels
+from MLVcode.InitializeNeighborhoods import InitializeNeighborhoods
+
+
+class SkeletonGraph:
+    """
+    The branches of a Medial Axis Transform (MAT) skeleton and the way they connect.
+
+    The nodes of the graph are the endpoints and junctions of the skeleton (see
+    labelSkeletonNodes), its edges are the skeletal branches as traced by traceSkeletonPixels.
+    The pixels of all branches are stored one after the other in the shared arrays X, Y, R
+    and F; edge e covers edgeStarts[e]:edgeStarts[e+1] of these arrays. The edges at every
+    node are stored in compressed sparse row (CSR) form, so that the edges and neighbors of a
+    node are found in O(degree). An isolated skeleton pixel is a node with a one pixel edge
+    that starts and ends in it.
+
+    Attributes:
+        skeleton (numpy.ndarray): The one pixel wide boolean skeleton image.
+        nodeLabels (numpy.ndarray): The node of every node pixel plus 1, and 0 for all other
+            pixels (see labelSkeletonNodes).
+        X, Y (numpy.ndarray): Column and row of every branch pixel.
+        R (numpy.ndarray): The radius function (distance map) at every branch pixel.
+        F (numpy.ndarray): The average outward flux at every branch pixel.
+        edgeStarts (numpy.ndarray): int64 offsets of the edges into X, Y, R and F, one more than numEdges.
+        edgeNodes (numpy.ndarray): An (numEdges, 2) array with the nodes at the first and the last
+            pixel of every edge, -1 where an edge does not end in a node (closed loops).
+        nodeX, nodeY (numpy.ndarray): Column and row of the first pixel of every node in row-major order.
+        nodeSize (numpy.ndarray): The number of pixels of every node.
+        nodeEdgeStarts (numpy.ndarray): int64 CSR offsets, one more than numNodes. The edges of node v
+            are nodeEdges[nodeEdgeStarts[v]:nodeEdgeStarts[v+1]].
+        nodeEdges (numpy.ndarray): The edge at each end of an edge, grouped by node. An edge from a
+            node back to itself is listed twice.
+        nodeNeighbors (numpy.ndarray): The node at the other end of each entry of nodeEdges.
+        properties (dict): Per-pixel MAT properties aligned with X and Y, filled in by
+            computeMATproperty.
+
+    -----------------------------------------------------
+    This function is part of the Mid Level Vision Toolbox:
+    http://www.mlvtoolbox.org
+
+    Python Implementation: Aravind Narayanan
+    Original MATLAB Implementation: Dirk Bernhardt-Walther
+    Copyright: Dirk Bernhardt-Walther
+    University of Toronto, Toronto, Ontario, Canada, 2024
+
+    Contact: dirk.walther@gmail.com
+    -----------------------------------------------------
+    """
+
+    def __init__(self, MAT, isThin=False):
+        """
+        Builds the skeleton graph of a MAT.
+
+        Args:
+            MAT (dict): The MAT with the fields 'skeleton', 'distance_map' and 'AOF'. 'AOF'
+            may be a sparse matrix.
+            isThin (bool, optional): If False, the skeleton is thinned to one pixel width
+            before it is traced. Default is False.
+        """
+        skeleton = np.asarray(MAT['skeleton']) != 0
+        if not isThin:
+            skeleton = morphology.skeletonize(skeleton)
+        self.skeleton = skeleton
+        self.Y, self.X, self.edgeStarts, nodeLabels = traceSkeletonPixels(skeleton, returnNodeLabels=True)
+        self.nodeLabels = nodeLabels
+        self.R = np.asarray(MAT['distance_map'])[self.Y, self.X]
+        if sparse.issparse(MAT['AOF']):
+            self.F = np.asarray(MAT['AOF'].tocsr()[self.Y, self.X]).ravel()
+        else:
+            self.F = np.asarray(MAT['AOF'])[self.Y, self.X]
+        self.properties = {}
+
+        numNodes = int(nodeLabels.max()) if nodeLabels.size > 0 else 0
+        nodePixels = np.flatnonzero(nodeLabels)
+        nodeOfPixel = nodeLabels.ravel()[nodePixels] - 1
+        self.nodeSize = np.bincount(nodeOfPixel, minlength=numNodes)
+        # Pixels are visited in row-major order, so the first pixel of a node is its minimum
+        firstPixel = np.full(numNodes, nodeLabels.size, dtype=np.int64)
+        np.minimum.at(firstPixel, nodeOfPixel, nodePixels)
+        self.nodeY, self.nodeX = np.divmod(firstPixel, nodeLabels.shape[1])
+
+        numEdges = len(self.edgeStarts) - 1
+        if numEdges > 0:
+            ends = np.stack((self.edgeStarts[:-1], self.edgeStarts[1:] - 1), axis=1)
+            self.edgeNodes = nodeLabels[self.Y[ends], self.X[ends]].astype(np.int64) - 1
+        else:
+            self.edgeNodes = np.zeros((0, 2), dtype=np.int64)
+
+        # One CSR entry per edge end that lies in a node
+        node = self.edgeNodes.ravel()
+        edge = np.repeat(np.arange(numEdges, dtype=np.int64), 2)
+        other = self.edgeNodes[:, ::-1].ravel()
+        inNode = node >= 0
+        order = np.argsort(node[inNode], kind='stable')
+        self.nodeEdges = edge[inNode][order]
+        self.nodeNeighbors = other[inNode][order]
+        self.nodeEdgeStarts = np.zeros(numNodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(node[inNode], minlength=numNodes), out=self.nodeEdgeStarts[1:])
+
+    @property
+    def numNodes(self):
+        return len(self.nodeEdgeStarts) - 1
+
+    @property
+    def numEdges(self):
+        return len(self.edgeStarts) - 1
+
+    def edgeSlice(self, e):
+        """
+        Returns the slice of edge e into the shared arrays X, Y, R and F.
+        """
+        return slice(self.edgeStarts[e], self.edgeStarts[e + 1])
+
+    def edgeLengths(self):
+        """
+        Returns the number of pixels of every edge.
+        """
+        return np.diff(self.edgeStarts)
+
+    def degree(self, v=None):
+        """
+        Returns the number of edge ends at node v, or at all nodes if v is None.
+        """
+        if v is None:
+            return np.diff(self.nodeEdgeStarts)
+        return self.nodeEdgeStarts[v + 1] - self.nodeEdgeStarts[v]
+
+    def incidentEdges(self, v):
+        """
+        Returns the edges at node v.
+        """
+        return self.nodeEdges[self.nodeEdgeStarts[v]:self.nodeEdgeStarts[v + 1]]
+
+    def neighbors(self, v):
+        """
+        Returns the nodes at the other end of the edges at node v, -1 for edges that end nowhere.
+        """
+        return self.nodeNeighbors[self.nodeEdgeStarts[v]:self.nodeEdgeStarts[v + 1]]
+
+    def branch(self, e):
+        """
+        Returns edge e as a skeletal branch {'X', 'Y', 'R', 'F'} of views into the shared arrays.
+        """
+        edge = self.edgeSlice(e)
+        return {'X': self.X[edge], 'Y': self.Y[edge], 'R': self.R[edge], 'F': self.F[edge]}
+
+    def branches(self):
+        """
+        Returns all edges as a list of skeletal branches, as traceSkeleton does.
+        """
+        return [self.branch(e) for e in range(self.numEdges)]
+
+
+def pruneSkeletonGraph(graph, minLength, minLengthRadiusRatio=None):
+    """
+    Removes the spurs of a skeleton in one pass over the edges of its skeleton graph.
+
+    A spur is an edge that ends in an endpoint on at least one side. It is removed if it has
+    fewer than minLength pixels or, if minLengthRadiusRatio is given, if its length is less
+    than minLengthRadiusRatio times the radius at its other end, i.e. if it is short compared
+    to the object it sticks out of. Closed loops with fewer than minLength pixels are removed
+    as well. The pixels a removed spur shares with a junction are kept as long as they still
+    connect the remaining edges at the junction. Where spurs were removed, the junction pixels
+    that are left may no longer be one pixel wide; the pruned skeleton is therefore thinned
+    once more, so that it is the skeleton that SkeletonGraph and traceSkeleton trace from it.
+
+    Args:
+        graph (SkeletonGraph): The graph of the skeleton.
+        minLength (int): The smallest number of pixels of a spur that is kept.
+        minLengthRadiusRatio (float, optional): The smallest ratio of the length of a spur
+            to the radius at its inner end. Default is None (no limit).
+
+    Returns:
+        tuple: A tuple (skeletonImage, keep) where:
+            skeletonImage (numpy.ndarray): The boolean one pixel wide skeleton without the spurs.
+            keep (numpy.ndarray): A boolean array that is True for the edges that are kept.
+    """
+    lengths = graph.edgeLengths()
+    degree = graph.degree()
+    ends = graph.edgeNodes
+    isEndpoint = np.zeros((graph.numEdges, 2), dtype=bool)
+    inNode = ends >= 0
+    isEndpoint[inNode] = degree[ends[inNode]] == 1
+    isSpur = isEndpoint.any(axis=1) | ((ends[:, 0] == ends[:, 1]) & (lengths == 1))
+    isLoop = ~inNode.any(axis=1)
+
+    remove = (isSpur | isLoop) & (lengths < minLength)
+    if minLengthRadiusRatio is not None:
+        # The radius where a spur leaves the object, at its last pixel if it starts in an endpoint
+        innerEnd = np.where(isEndpoint[:, 0], graph.edgeStarts[1:] - 1, graph.edgeStarts[:-1])
+        R = graph.R[innerEnd] if graph.numEdges > 0 else np.zeros(0)
+        remove |= isSpur & ~isEndpoint.all(axis=1) & (lengths < minLengthRadiusRatio * R)
+    keep = ~remove
+
+    skeletonImage = graph.skeleton.copy()
+    edgeOfPixel = np.repeat(np.arange(graph.numEdges), lengths)
+    removed = remove[edgeOfPixel]
+    skeletonImage[graph.Y[removed], graph.X[removed]] = False
+    # Junction pixels stay as long as one of their edges does
+    nodeKept = np.zeros(graph.numNodes + 1, dtype=bool)
+    nodeKept[ends[keep][ends[keep] >= 0] + 1] = True
+    nodeKept[0] = True
+    skeletonImage &= nodeKept[graph.nodeLabels]
+    kept = ~removed
+    skeletonImage[graph.Y[kept], graph.X[kept]] = True
+
+    # Junction pixels that only led into removed spurs are peeled off, one layer at a time
+    onKeptEdge = np.zeros(skeletonImage.shape, dtype=bool)
+    onKeptEdge[graph.Y[kept], graph.X[kept]] = True
+    lostEdge = np.zeros(graph.numNodes + 1, dtype=bool)
+    lostEdge[ends[remove][ends[remove] >= 0] + 1] = True
+    lostEdge[0] = False
+    dangling = skeletonImage & lostEdge[graph.nodeLabels] & ~onKeptEdge
+    candidateY, candidateX = np.nonzero(dangling)
+    padded = np.pad(skeletonImage, 1)
+    neighborOffsets = InitializeNeighborhoods()
+    while len(candidateY) > 0:
+        neighborCount = sum(padded[candidateY + 1 + dy, candidateX + 1 + dx] for dy, dx in neighborOffsets)
+        isEnd = neighborCount <= 1
+        if not np.any(isEnd):
+            break
+        padded[candidateY[isEnd] + 1, candidateX[isEnd] + 1] = False
+        candidateY, candidateX = candidateY[~isEnd], candidateX[~isEnd]
+    skeletonImage = padded[1:-1, 1:-1]
+
+    # Thinning only changes the neighbourhood of the removed pixels, as the skeleton was thin before
+    if np.any(remove):
+        skeletonImage = morphology.skeletonize(skeletonImage)
+    return skeletonImage, keep
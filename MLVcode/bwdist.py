@@ -3,7 +3,7 @@ from scipy.ndimage import distance_transform_edt
 
 
 # BWDist
-def bwdist(mat):
+def bwdist(mat, returnPlanes=False, indexDtype=np.intp, distanceDtype=np.float64):
     """
     Computes the Euclidean distance transform of a binary image and returns the distances 
     and the indices of the nearest non-zero pixels.
@@ -14,6 +14,12 @@ def bwdist(mat):
     Args:
         mat (ndarray): A 2D binary matrix (NumPy array) where non-zero elements represent foreground pixels 
                        and zeros represent background pixels.
+        returnPlanes (bool, optional): If True, the row and column indices of the nearest non-zero pixels are
+                       returned as two separate arrays instead of the flattened index. Default is False.
+        indexDtype (dtype, optional): The integer type of the returned indices, e.g. np.int32 to halve the
+                       memory of the index arrays. Default is np.intp.
+        distanceDtype (dtype, optional): The floating point type of the returned distances, e.g. np.float32.
+                       Default is np.float64.
 
     Returns:
         tuple:
@@ -21,6 +27,8 @@ def bwdist(mat):
                            distance to the nearest non-zero pixel in `mat`.
             - idx (ndarray): A 2D array of the same shape as `mat`, where each element contains the flattened 
                              index of the nearest non-zero pixel in the input matrix `mat`.
+        If returnPlanes is True, a tuple (d, rows, cols) is returned instead, where rows and cols hold the row
+        and column of the nearest non-zero pixel.
 
     Notes:
     - The function uses the Euclidean distance transform provided by `scipy.ndimage.distance_transform_edt`.
@@ -30,7 +38,7 @@ def bwdist(mat):
       a binary image is necessary.
 
     Raises:
-        None: This function assumes that `mat` is a valid binary matrix.
+        ValueError: If the indices of `mat` do not fit into `indexDtype`.
         
     -----------------------------------------------------
     This function is part of the Mid Level Vision Toolbox:
@@ -44,13 +52,16 @@ def bwdist(mat):
     Contact: dirk.walther@gmail.com
     -----------------------------------------------------
     """
-    d, labels =distance_transform_edt(
+    d, labels = distance_transform_edt(
         mat==0, return_distances=True, return_indices=True)
-    # print("d: \n", d)
-    # print("labels: \n", labels)
-    idx = np.zeros(mat.shape, dtype=np.intp)
-    for row in range(mat.shape[0]):
-        for col in range(mat.shape[1]):
-            idx[row, col] = labels[0][row, col] * mat.shape[1] + labels[1][row, col]
-    # print("IDX: \n", idx)
+    d = d.astype(distanceDtype, copy=False)
+    numIndices = mat.size if not returnPlanes else max(mat.shape)
+    if numIndices > np.iinfo(indexDtype).max:
+        raise ValueError('Indices of an image of shape %s do not fit into %s' % (mat.shape, np.dtype(indexDtype)))
+    if returnPlanes:
+        return d, labels[0].astype(indexDtype), labels[1].astype(indexDtype)
+    # Row-major flattened index of the nearest non-zero pixel
+    idx = labels[0].astype(indexDtype)
+    idx *= mat.shape[1]
+    idx += labels[1]
     return d, idx
\ No newline at end of file
@@ -1,23 +1,7 @@
 import numpy as np
+from scipy.spatial import cKDTree
 
 
-def recursive_classes(j, merge_matrix, is_junction_available):
-    if not is_junction_available[j]:
-        return [], merge_matrix, is_junction_available
-
-    is_junction_available[j] = False
-    all_js = [j]
-    new_js = np.where(merge_matrix[j, :])[0]
-
-    merge_matrix[j, :] = False
-    merge_matrix[:, j] = False
-
-    for nj in new_js:
-        additional_js, merge_matrix, is_junction_available = recursive_classes(nj, merge_matrix, is_junction_available)
-        all_js.extend(additional_js)
-
-    return all_js, merge_matrix, is_junction_available
-
 def cleanupJunctions(junctions, thresh=2):
     """
     Cleans up junctions by merging junctions that are within `thresh` pixels of each other.
@@ -30,6 +14,14 @@ def cleanupJunctions(junctions, thresh=2):
     Returns:
         list of dicts: Cleaned up and merged junctions.
 
+    Notes:
+    - The pairs of junctions within thresh are found with a KD-tree radius query, and the
+      classes of junctions to merge are found with an iterative traversal (see
+      getJunctionClasses). The positions and the lists of contour and segment IDs of the
+      merged junctions are computed for all classes at once.
+    - The junctions that are not merged come first, in their original order, followed by one
+      merged junction per class.
+
     -----------------------------------------------------
     This function is part of the Mid Level Vision Toolbox:
     http://www.mlvtoolbox.org
@@ -44,44 +36,90 @@ def cleanupJunctions(junctions, thresh=2):
     """
     thresh_squared = thresh ** 2
     num_junctions = len(junctions)
-    merge_matrix = np.zeros((num_junctions, num_junctions), dtype=bool)
+    if num_junctions == 0:
+        return []
+    positions = np.array([np.asarray(j['position'], dtype=float).ravel()[:2] for j in junctions])
 
-    # Calculate which junctions need to be merged
-    for j1 in range(num_junctions):
-        for j2 in range(j1 + 1, num_junctions):
-            if np.sum((np.array(junctions[j1]['position']) - np.array(junctions[j2]['position']))**2) <= thresh_squared:
-                merge_matrix[j1, j2] = True
+    # Calculate which junctions need to be merged. The query radius is slightly larger than
+    # thresh, so that the comparison below decides the pairs at the boundary.
+    pairs = cKDTree(positions).query_pairs(thresh * (1 + 1e-9) + 1e-12, output_type='ndarray')
+    pairs = pairs[np.sum((positions[pairs[:, 0]] - positions[pairs[:, 1]])**2, axis=1) <= thresh_squared]
 
     # Determine equivalence classes
-    equivalence_classes = []
+    members, class_sizes = getJunctionClasses(pairs, num_junctions)
     is_junction_available = np.ones(num_junctions, dtype=bool)
-
-    while np.any(merge_matrix):
-        j1 = np.where(merge_matrix)[0][0]
-        new_class, merge_matrix, is_junction_available = recursive_classes(j1, merge_matrix, is_junction_available)
-        equivalence_classes.append(new_class)
+    is_junction_available[members] = False
 
     # Initialize the resulting junctions with all junctions that do not have neighbors
     cleaned_junctions = [junctions[i] for i in range(num_junctions) if is_junction_available[i]]
+    if len(class_sizes) == 0:
+        return cleaned_junctions
+
+    # Average the positions of the members of every class
+    num_classes = len(class_sizes)
+    class_of = np.repeat(np.arange(num_classes), class_sizes)
+    sums = np.stack([np.bincount(class_of, weights=positions[members, k], minlength=num_classes)
+                     for k in range(2)], axis=1)
+    centroids = sums / class_sizes[:, None]
+
+    # Combine contour segments, keeping the first occurrence of every (contour, segment) pair
+    ids_per_member = [len(junctions[j]['contourIDs']) for j in members]
+    contour_ids = np.array([c for j in members for c in junctions[j]['contourIDs']], dtype=np.int64)
+    segment_ids = np.array([s for j in members for s in junctions[j]['segmentIDs']], dtype=np.int64)
+    id_class = np.repeat(class_of, ids_per_member)
+    _, first = np.unique(np.stack((id_class, contour_ids, segment_ids), axis=1), axis=0, return_index=True)
+    first = np.sort(first)
+    id_starts = np.searchsorted(id_class[first], np.arange(num_classes + 1))
+    contour_ids = contour_ids[first].tolist()
+    segment_ids = segment_ids[first].tolist()
 
     # Merge junctions that are in equivalence classes
-    for this_class in equivalence_classes:
-        all_positions = np.array([junctions[j]['position'] for j in this_class])
+    for c in range(num_classes):
         this_junct = {
-            'position': np.mean(all_positions, axis=0).tolist(),
-            'contourIDs': [],
-            'segmentIDs': []
+            'position': centroids[c].tolist(),
+            'contourIDs': contour_ids[id_starts[c]:id_starts[c + 1]],
+            'segmentIDs': segment_ids[id_starts[c]:id_starts[c + 1]]
         }
-
-        # Combine contour segments
-        contour_segment_set = set()
-        for j in this_class:
-            for contour_id, segment_id in zip(junctions[j]['contourIDs'], junctions[j]['segmentIDs']):
-                if (contour_id, segment_id) not in contour_segment_set:
-                    contour_segment_set.add((contour_id, segment_id))
-                    this_junct['contourIDs'].append(contour_id)
-                    this_junct['segmentIDs'].append(segment_id)
-
         cleaned_junctions.append(this_junct)
 
     return cleaned_junctions
+
+
+def getJunctionClasses(pairs, num_junctions):
+    """
+    Groups junctions into the classes that are merged, given the pairs (i, j), i < j, that are
+    within the merge threshold.
+
+    A class is started at the first junction that still has a pair with an unassigned junction
+    of higher index, and it collects depth first, in increasing order, the unassigned junctions
+    of higher index paired with its members. This is the order in which the classes were
+    collected by recursion before, so that the merged junctions are the same.
+
+    Returns:
+        tuple: A tuple (members, class_sizes) with the junctions of all classes, class by class
+        in the order of collection, and the number of junctions in every class.
+    """
+    # The junctions of higher index paired with every junction, in increasing order
+    pairs = pairs[np.lexsort((pairs[:, 1], pairs[:, 0]))]
+    starts = np.zeros(num_junctions + 1, dtype=np.int64)
+    np.cumsum(np.bincount(pairs[:, 0], minlength=num_junctions), out=starts[1:])
+    neighbors = pairs[:, 1].tolist()
+    starts = starts.tolist()
+
+    assigned = [False] * num_junctions
+    members = []
+    class_sizes = []
+    for start in range(num_junctions):
+        if assigned[start] or not any(not assigned[n] for n in neighbors[starts[start]:starts[start + 1]]):
+            continue
+        size = len(members)
+        stack = [start]
+        while stack:
+            j = stack.pop()
+            if assigned[j]:
+                continue
+            assigned[j] = True
+            members.append(j)
+            stack.extend(reversed(neighbors[starts[j]:starts[j + 1]]))
+        class_sizes.append(len(members) - size)
+    return np.array(members, dtype=np.int64), np.array(class_sizes, dtype=np.int64)
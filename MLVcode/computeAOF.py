@@ -1,20 +1,33 @@
 import numpy as np
-from tqdm import tqdm
+from scipy import ndimage, sparse
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
 
-
-def computeAOF(D, IDX, sphere_points, epsilon):
+def computeAOF(D, IDX, sphere_points, epsilon, workers=1, backend='process', sparseThreshold=None):
     """
     This function computes the gradient vector field with regard to a distance function.
 
     Parameters:
     D (array_like): Distance map computed with respect to the binary image.
-    IDX (array_like): The index of the closest point to the boundary.
+    IDX (array_like or tuple): The index of the closest point to the boundary, either as linear
+    indices into D or as a (rows, cols) pair of arrays holding the row and column of that point.
     sphere_points (array_like): Points on a sphere, used in the computation.
     epsilon (float): A small value used to stabilize computations.
+    workers (int, optional): Number of workers used to compute the flux. With more than one
+    worker the image is split into row bands that are computed in parallel. Default is 1.
+    backend (str, optional): The pool the row bands run on, either 'process' or 'thread'.
+    With 'process', D, IDX and the flux image are placed in shared memory instead of being
+    copied to every worker. Default is 'process'.
+    sparseThreshold (float, optional): If given, the flux is only evaluated at the pixels that
+    can reach sparseThreshold * number_of_samples (see findAOFcandidates) and is returned as a
+    sparse matrix. The candidates are evaluated on a thread pool with the given number of
+    workers, regardless of backend. Default is None (dense).
 
     Returns:
     array_like: Flux image, a 2D matrix with average outward flux values computed 
-    from the gradient vector field of a binary image.
+    from the gradient vector field of a binary image. With sparseThreshold, a
+    scipy.sparse.csr_matrix that holds the exact flux at the candidate pixels; all flux
+    values that are not stored are below the threshold.
 
     -----------------------------------------------------
     Notes:
@@ -42,42 +55,256 @@ def computeAOF(D, IDX, sphere_points, epsilon):
     -----------------------------------------------------
     """
 
-    # Initialise Q
     (m, n) = D.shape
-    nOfSamples = sphere_points.shape[0]
 
     # For each point on the sphere create the normal vector
-    normals = np.zeros(sphere_points.shape)
+    normals = np.array(sphere_points, dtype=float)
     fluxImage = np.zeros((m, n))
 
-    for t in range(nOfSamples):
-        normals[t, 0] = sphere_points[t, 0]
-        normals[t, 1] = sphere_points[t, 1]
-    
-    for i in tqdm(range(m)):
-        for j in range(n):
-            flux_value = 0
-            if D[i, j] > -1.5:
-                if i + 1 > epsilon and j + 1 > epsilon and i + 1 < m - epsilon and j + 1 < n - epsilon:
-                    # sum over dot product of normal and the gradient vector field (q-dot)
-                    for ind in range(nOfSamples):
-                        # A point on the sphere
-                        px = i + sphere_points[ind, 0] + 0.5
-                        py = j + sphere_points[ind, 1] + 0.5
-                        # the indices of the grid cell that sphere points fall into
-                        cI = int(px - 1)
-                        cJ = int(py - 1)
-
-                        bx, by = np.unravel_index(IDX[cI, cJ], D.shape)
-                        # The vector connect them
-                        qq = np.array([bx - px, by - py])
-                        d = np.linalg.norm(qq)
-                        if d != 0:
-                            qq /= d
-                        else:
-                            qq = 0
-                        flux_value += np.dot(qq, normals[ind])
-
-            fluxImage[i, j] = flux_value
-
-    return fluxImage
\ No newline at end of file
+    # Only pixels away from the image border (by epsilon) receive a flux value
+    rows = np.arange(m)
+    cols = np.arange(n)
+    rows = rows[(rows + 1 > epsilon) & (rows + 1 < m - epsilon)]
+    cols = cols[(cols + 1 > epsilon) & (cols + 1 < n - epsilon)]
+    if len(rows) == 0 or len(cols) == 0:
+        return sparse.csr_matrix((m, n)) if sparseThreshold is not None else fluxImage
+
+    if sparseThreshold is not None:
+        candidates = findAOFcandidates(D, IDX, normals, rows, cols, sparseThreshold)
+        pixelRows, pixelCols = np.nonzero(candidates)
+        pixelRows += rows[0]
+        pixelCols += cols[0]
+        chunks = [(r, c) for r, c in zip(np.array_split(pixelRows, max(workers, 1)),
+                                          np.array_split(pixelCols, max(workers, 1))) if len(r) > 0]
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+            values = list(pool.map(lambda chunk: computeAOFPixels(IDX, normals, *chunk, n), chunks))
+        values = np.concatenate(values) if values else np.zeros(0)
+        return sparse.csr_matrix((values, (pixelRows, pixelCols)), shape=(m, n))
+
+    if workers <= 1:
+        fluxImage[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1] = computeAOFRows(
+            D, IDX, normals, rows, cols)
+        return fluxImage
+
+    # Every band reads its halo (the rows one sample radius above and below it) straight
+    # from the full D and IDX, so the bands add up to exactly the serial result.
+    bands = [band for band in np.array_split(rows, workers) if len(band) > 0]
+    if backend == 'thread':
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            blocks = pool.map(lambda band: computeAOFRows(D, IDX, normals, band, cols), bands)
+            for band, block in zip(bands, blocks):
+                fluxImage[band[0]:band[-1] + 1, cols[0]:cols[-1] + 1] = block
+    elif backend == 'process':
+        allShared = []
+        try:
+            specs = {}
+            if isinstance(IDX, tuple):
+                named = (('D', D), ('IDXRows', IDX[0]), ('IDXCols', IDX[1]), ('flux', fluxImage))
+            else:
+                named = (('D', D), ('IDX', IDX), ('flux', fluxImage))
+            for name, array in named:
+                array = np.ascontiguousarray(array)
+                shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+                allShared.append(shm)
+                np.ndarray(array.shape, array.dtype, buffer=shm.buf)[...] = array
+                specs[name] = (shm.name, array.shape, array.dtype)
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                list(pool.map(computeAOFBand, [specs] * len(bands), [normals] * len(bands),
+                              bands, [cols] * len(bands)))
+            fluxImage[...] = np.ndarray(fluxImage.shape, fluxImage.dtype, buffer=allShared[-1].buf)
+        finally:
+            for shm in allShared:
+                shm.close()
+                shm.unlink()
+    else:
+        raise ValueError('Unknown backend: ' + str(backend))
+    return fluxImage
+
+
+def computeAOFBand(specs, normals, rows, cols):
+    """
+    Computes the flux for one row band from the shared D and IDX and writes it
+    into the shared flux image. The shared memory blocks are attached for the band
+    and closed again once it is written; the parent unlinks them.
+
+    Args:
+        specs (dict): Maps array names to (shared memory name, shape, dtype) tuples.
+        normals (numpy.ndarray): The normal vectors of the sample points on the sphere.
+        rows (numpy.ndarray): Ascending, contiguous row indices of the band.
+        cols (numpy.ndarray): Ascending, contiguous column indices of the band.
+    """
+    handles = []
+    arrays = {}
+    IDX = None
+    try:
+        for name, (shmName, shape, dtype) in specs.items():
+            shm = shared_memory.SharedMemory(name=shmName)
+            handles.append(shm)
+            arrays[name] = np.ndarray(shape, dtype, buffer=shm.buf)
+        if 'IDX' in arrays:
+            IDX = arrays['IDX']
+        else:
+            IDX = (arrays['IDXRows'], arrays['IDXCols'])
+        arrays['flux'][rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1] = computeAOFRows(
+            arrays['D'], IDX, normals, rows, cols)
+    finally:
+        # The views have to be released before the buffers can be closed
+        arrays = IDX = None
+        for shm in handles:
+            try:
+                shm.close()
+            except BufferError:
+                # Still exported by the traceback of an error, released when the worker exits
+                pass
+
+
+def computeAOFRows(D, IDX, normals, rows, cols):
+    """
+    Computes the average outward flux for a contiguous block of pixels of D.
+
+    Rather than visiting every pixel, the flux is accumulated one sphere sample at a
+    time over the whole block: for each sample the row and column of the grid cell the
+    sample falls into is computed once per row and once per column, and the closest
+    boundary points are gathered from IDX for all pixels of the block at once.
+
+    Args:
+        D (numpy.ndarray): Distance map computed with respect to the binary image.
+        IDX (numpy.ndarray or tuple): The linear index of the closest point to the boundary,
+            or a (rows, cols) pair of arrays with its row and column.
+        normals (numpy.ndarray): An array of shape (number_of_samples, 2) with the
+            normal vectors of the sample points on the sphere.
+        rows (numpy.ndarray): Ascending, contiguous row indices of the block.
+        cols (numpy.ndarray): Ascending, contiguous column indices of the block.
+
+    Returns:
+        numpy.ndarray: The flux values of the block, of shape (len(rows), len(cols)).
+        Pixels where D is not greater than -1.5 are set to 0.
+    """
+    n = D.shape[1]
+    flux = np.zeros((len(rows), len(cols)))
+    for ind in range(normals.shape[0]):
+        # A point on the sphere, for every row and every column of the block
+        px = rows + normals[ind, 0] + 0.5
+        py = cols + normals[ind, 1] + 0.5
+        # the indices of the grid cell that sphere points fall into
+        cI = np.trunc(px - 1).astype(np.intp)
+        cJ = np.trunc(py - 1).astype(np.intp)
+
+        if isinstance(IDX, tuple):
+            closestRow = IDX[0][cI[:, None], cJ[None, :]]
+            closestCol = IDX[1][cI[:, None], cJ[None, :]]
+        else:
+            closest = IDX[cI[:, None], cJ[None, :]]
+            closestRow = closest // n
+            closestCol = closest % n
+        # The vector connecting them
+        qx = closestRow - px[:, None]
+        qy = closestCol - py[None, :]
+        d = np.sqrt(qx * qx + qy * qy)
+        nonzero = d != 0
+        d[~nonzero] = 1
+        flux += np.where(nonzero, (qx / d) * normals[ind, 0] + (qy / d) * normals[ind, 1], 0)
+
+    flux[~(D[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1] > -1.5)] = 0
+    return flux
+
+
+def findAOFcandidates(D, IDX, normals, rows, cols, threshold):
+    """
+    Finds the pixels of a block whose average outward flux can reach threshold * number_of_samples.
+
+    The samples of a pixel at (i, j) read the closest boundary points stored in the cells of
+    rows i-2..i and columns j-2..j. Pairing every sample with its antipode, a pair whose two
+    samples see the same boundary point contributes at most 0, and any other pair at most
+    rho / r, where rho is the diameter of the boundary points in these nine cells and r the
+    distance of the pixel centre from their bounding box, minus the sample radius. The flux
+    is therefore at most number_of_samples / 2 * min(2, rho / r), which is small everywhere
+    except close to the boundary and on the ridges of the distance map.
+
+    Args:
+        D (numpy.ndarray): Distance map computed with respect to the binary image.
+        IDX (numpy.ndarray or tuple): The linear index of the closest point to the boundary,
+            or a (rows, cols) pair of arrays with its row and column.
+        normals (numpy.ndarray): An array of shape (number_of_samples, 2) with the
+            normal vectors of the sample points on the sphere.
+        rows (numpy.ndarray): Ascending, contiguous row indices of the block.
+        cols (numpy.ndarray): Ascending, contiguous column indices of the block.
+        threshold (float): The threshold on the average outward flux per sample.
+
+    Returns:
+        numpy.ndarray: A boolean array of shape (len(rows), len(cols)), True for the candidates.
+        Pixels where D is not greater than -1.5 are never candidates. If the sample points are
+        not symmetric about the origin, or threshold is not positive, all other pixels are.
+    """
+    block = (slice(rows[0], rows[-1] + 1), slice(cols[0], cols[-1] + 1))
+    candidates = D[block] > -1.5
+    half = normals.shape[0] // 2
+    if threshold <= 0 or normals.shape[0] % 2 != 0 or \
+            not np.allclose(normals[half:], -normals[:half], rtol=0, atol=1e-12):
+        return candidates
+
+    if isinstance(IDX, tuple):
+        closestRow, closestCol = IDX
+    else:
+        closestRow, closestCol = np.divmod(IDX, D.shape[1])
+    # Extremes over the cells of rows i-2..i and columns j-2..j
+    extremes = dict(footprint=np.ones((3, 3), dtype=bool), origin=(1, 1), mode='nearest')
+    rowMax = ndimage.maximum_filter(closestRow, **extremes)[block].astype(np.float64)
+    rowMin = ndimage.minimum_filter(closestRow, **extremes)[block].astype(np.float64)
+    colMax = ndimage.maximum_filter(closestCol, **extremes)[block].astype(np.float64)
+    colMin = ndimage.minimum_filter(closestCol, **extremes)[block].astype(np.float64)
+
+    rho = np.hypot(rowMax - rowMin, colMax - colMin)
+    centreRow = rows[:, None] + 0.5
+    centreCol = cols[None, :] + 0.5
+    dx = np.maximum(0, np.maximum(rowMin - centreRow, centreRow - rowMax))
+    dy = np.maximum(0, np.maximum(colMin - centreCol, centreCol - colMax))
+    r = np.hypot(dx, dy) - 1
+    # A small margin absorbs the rounding of the sample points and of the flux
+    reachable = (r <= 0) | (rho >= 2 * threshold * r * (1 - 1e-9))
+    # The cells of the first two rows and columns are clipped and not covered by the bound
+    reachable[rows < 2, :] = True
+    reachable[:, cols < 2] = True
+    return candidates & reachable
+
+
+def computeAOFPixels(IDX, normals, pixelRows, pixelCols, n):
+    """
+    Computes the average outward flux for a list of pixels.
+
+    The flux of every pixel is accumulated over the samples in the same order and with the
+    same arithmetic as in computeAOFRows, so both give identical values.
+
+    Args:
+        IDX (numpy.ndarray or tuple): The linear index of the closest point to the boundary,
+            or a (rows, cols) pair of arrays with its row and column.
+        normals (numpy.ndarray): An array of shape (number_of_samples, 2) with the
+            normal vectors of the sample points on the sphere.
+        pixelRows (numpy.ndarray): The row indices of the pixels.
+        pixelCols (numpy.ndarray): The column indices of the pixels.
+        n (int): The number of columns of the image.
+
+    Returns:
+        numpy.ndarray: The flux values of the pixels.
+    """
+    flux = np.zeros(len(pixelRows))
+    for ind in range(normals.shape[0]):
+        px = pixelRows + normals[ind, 0] + 0.5
+        py = pixelCols + normals[ind, 1] + 0.5
+        cI = np.trunc(px - 1).astype(np.intp)
+        cJ = np.trunc(py - 1).astype(np.intp)
+
+        if isinstance(IDX, tuple):
+            closestRow = IDX[0][cI, cJ]
+            closestCol = IDX[1][cI, cJ]
+        else:
+            closest = IDX[cI, cJ]
+            closestRow = closest // n
+            closestCol = closest % n
+        qx = closestRow - px
+        qy = closestCol - py
+        d = np.sqrt(qx * qx + qy * qy)
+        nonzero = d != 0
+        d[~nonzero] = 1
+        flux += np.where(nonzero, (qx / d) * normals[ind, 0] + (qy / d) * normals[ind, 1], 0)
+    return flux
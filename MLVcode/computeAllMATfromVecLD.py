@@ -1,26 +1,42 @@
-from skimage.morphology import medial_axis, skeletonize
+import os
+import time
+import traceback
+import multiprocessing
 import numpy as np
-from renderLineDrawing import renderLineDrawing
-from computeMAT import computeMAT
-from computeAllMATproperties import computeAllMATproperties
-from mapMATtoContour import mapMATtoContour
-from MATpropertiesToContours import MATpropertiesToContours
-from getMATpropertyStats import getMATpropertyStats
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from MLVcode.renderLineDrawing import renderLineDrawing
+from MLVcode.computeMAT import computeMAT
+from MLVcode.computeAllMATproperties import computeAllMATproperties, DEFAULT_MAT_PROPERTIES
+from MLVcode.MATpropertiesToContours import MATpropertiesToContours
+from MLVcode.getMATpropertyStats import getMATpropertyStats
 
 
-
-def computeAllMATfromVecLD(vecLD):
+def computeAllMATfromVecLD(vecLD, cacheDir=None, workers=1, headless=False, prop=None):
     """
     Computes the medial axis properties for a line drawing structure.
 
     Parameters:
     - vecLD: The vectorized line drawing structure or a list of such structures.
              This drawing will be rendered into an image to compute the medial axis properties.
+    - cacheDir: A directory used as a cache of computed MATs (see computeMAT). When the same drawings
+                are processed again, their MATs are read from the cache instead of being recomputed.
+                Default is None (no cache).
+    - workers: The number of worker processes for a list of drawings (see computeAllMATfromVecLDBatch).
+               Default is 1.
+    - headless: If True, the MAT of a single drawing is computed without plots and with the outer
+                boundary computed from the rendered drawing (see computeMAT). Drawings in a list
+                are always computed this way. Default is False.
+    - prop: The list of MAT properties to compute (see computeAllMATproperties).
+            Default is None ('parallelism', 'separation' and 'taper', see DEFAULT_MAT_PROPERTIES).
 
     Returns:
     - vecLD: The line drawing structure(s) with the medial axis properties added.
     - MAT: The medial axis. In case of multiple vecLD as input, this will be a list of MATs.
     - MATskel: The MAT skeleton image(s) with ratings.
+    - seconds: Only for a list of drawings, the time in seconds it took to process each drawing,
+               NaN where the worker process died.
+    For a list of drawings, the entries of drawings that failed are None.
 
     Note:
     -----------------------------------------------------
@@ -36,29 +52,179 @@ def computeAllMATfromVecLD(vecLD):
     -----------------------------------------------------
     """
 
-    if len(vecLD) > 1:
-        resLD = []
-        MAT = []
-        for l in range(len(vecLD)):
-            print(f"Processing {vecLD[l]['originalImage']} ({l} of {len(vecLD)})...")
-            thisLD, thisMAT = computeAllMATfromVecLD(vecLD[l])
-            resLD.append(thisLD)
-            MAT.append(thisMAT)
-        
+    if not isinstance(vecLD, dict):
+        resLD = [None] * len(vecLD)
+        MAT = [None] * len(vecLD)
+        MATskel = [None] * len(vecLD)
+        seconds = [float('nan')] * len(vecLD)
+        for done, (l, result, drawingSeconds, error) in enumerate(
+                computeAllMATfromVecLDBatch(vecLD, workers, cacheDir, prop), start=1):
+            seconds[l] = drawingSeconds
+            if error is not None:
+                print(f"Failed {vecLD[l]['originalImage']} ({done} of {len(vecLD)}):\n{error}")
+                continue
+            print(f"Processed {vecLD[l]['originalImage']} ({done} of {len(vecLD)}) in {drawingSeconds:.1f} s")
+            resLD[l], MAT[l], MATskel[l] = result
+
         vecLD = resLD
         print("Done.")
-        return vecLD, MAT, MATskel # Need to fix this
-    
+        return vecLD, MAT, MATskel, seconds
+
     # This is the actual process for a single vecLD
+    if prop is None:
+        prop = DEFAULT_MAT_PROPERTIES
     img = renderLineDrawing(vecLD)
-    MAT = computeMAT(img)
-    MATimg, MATskel, branches = computeAllMATproperties(MAT, img)
-    prop = MATimg.keys()
+    MAT = computeMAT(img, cacheDir=cacheDir, headless=headless)[0]
+    MATimg, MATskel, branches = computeAllMATproperties(MAT, img, prop)
+    prop = list(MATimg.keys())
 
     for p in range(len(prop)):
-        thisPropImg = mapMATtoContour(branches, img, MATskel[prop[p]])
-        vecLD = MATpropertiesToContours(vecLD, thisPropImg, prop[p])
-        vecLD = getMATpropertyStats(vecLD, prop[p]) 
+        vecLD = MATpropertiesToContours(vecLD, MATimg[prop[p]], prop[p])
+        vecLD = getMATpropertyStats(vecLD, prop[p])[0]
 
     return vecLD, MAT, MATskel
-    
+
+
+def computeAllMATfromVecLDBatch(vecLDs, workers=None, cacheDir=None, prop=None):
+    """
+    Computes the medial axis properties for many line drawings on a pool of worker processes.
+
+    The drawings are submitted largest image first, so that no large drawing is left over at
+    the end of the run while the other workers are idle. Results are yielded as soon as a
+    drawing is finished, not in the order of vecLDs. An exception in one drawing does not
+    stop the others; it is reported with that drawing instead. The MATs are computed headless.
+
+    A worker process that dies, e.g. when it is killed for running out of memory, breaks the
+    whole pool. The drawings that had not started yet are then resubmitted to a new pool, and
+    each drawing that was running at the time is retried in a process of its own, so that only
+    the drawing that kills its process again is reported as failed.
+
+    Args:
+        vecLDs (list): The vectorized line drawing structures.
+        workers (int, optional): The number of worker processes. With 1, the drawings are
+            computed in the calling process. Default is None (one per CPU).
+        cacheDir (str, optional): A directory used as a cache of computed MATs (see computeMAT).
+            Default is None.
+        prop (list, optional): The MAT properties to compute (see computeAllMATproperties).
+            Default is None (DEFAULT_MAT_PROPERTIES).
+
+    Yields:
+        tuple: A tuple (index, result, seconds, error) for every drawing, where:
+            index (int): The position of the drawing in vecLDs.
+            result (tuple): (vecLD, MAT, MATskel) as returned by computeAllMATfromVecLD for a
+            single drawing, or None if the drawing failed.
+            seconds (float): The time it took to process the drawing in its worker.
+            error (str): The traceback of the failure, or None.
+
+    -----------------------------------------------------
+    This function is part of the Mid Level Vision Toolbox:
+    http://www.mlvtoolbox.org
+
+    Python Implementation: Aravind Narayanan
+    Original MATLAB Implementation: Dirk Bernhardt-Walther
+    Copyright: Dirk Bernhardt-Walther
+    University of Toronto, Toronto, Ontario, Canada, 2024
+
+    Contact: dirk.walther@gmail.com
+    -----------------------------------------------------
+    """
+    # Largest images first, then the drawings with the most line segments
+    sizes = [drawingSize(ld) for ld in vecLDs]
+    order = sorted(range(len(vecLDs)), key=lambda l: sizes[l], reverse=True)
+
+    if workers == 1:
+        for l in order:
+            yield (l,) + processVecLD(vecLDs[l], cacheDir, prop)
+        return
+
+    workers = workers or os.cpu_count() or 1
+    started = multiprocessing.SimpleQueue()
+    startedDrawings = set()
+    isolated = set()
+    remaining = order
+    while remaining:
+        # Drawings that were running when a worker process died get a process of their own
+        shared = [l for l in remaining if l not in isolated]
+        pools = []
+        futures = {}
+        if shared:
+            pools.append(ProcessPoolExecutor(max_workers=max(workers - len(remaining) + len(shared), 1),
+                                             initializer=reportStartedDrawings, initargs=(started,)))
+            futures.update({pools[-1].submit(processVecLD, vecLDs[l], cacheDir, prop, l): l for l in shared})
+        for l in remaining:
+            if l in isolated:
+                pools.append(ProcessPoolExecutor(max_workers=1))
+                futures[pools[-1].submit(processVecLD, vecLDs[l], cacheDir, prop)] = l
+
+        broken = []
+        try:
+            for future in as_completed(futures):
+                l = futures[future]
+                try:
+                    result, seconds, error = future.result()
+                except BrokenProcessPool:
+                    if l not in isolated:
+                        broken.append(l)
+                        continue
+                    result, seconds, error = None, float('nan'), traceback.format_exc()
+                except Exception:
+                    result, seconds, error = None, float('nan'), traceback.format_exc()
+                yield l, result, seconds, error
+        finally:
+            for pool in pools:
+                pool.shutdown(wait=True, cancel_futures=True)
+
+        while not started.empty():
+            startedDrawings.add(started.get())
+        suspects = [l for l in broken if l in startedDrawings]
+        if broken and not suspects:
+            # The pool broke before any of its drawings started, so retrying would not help
+            for l in broken:
+                yield l, None, float('nan'), 'A worker process died before it started a drawing'
+            broken = []
+        isolated.update(suspects)
+        remaining = broken
+
+
+def drawingSize(vecLD):
+    """
+    Returns (number of pixels, number of line segments) of a drawing for scheduling it, or
+    (0, 0) if the drawing is malformed, which leaves the error to its worker.
+    """
+    try:
+        return (int(np.prod(np.asarray(vecLD['imsize'], dtype=np.int64))),
+                sum(len(c) for c in np.asarray(vecLD['contours'], dtype=object).ravel()))
+    except Exception:
+        return (0, 0)
+
+
+def reportStartedDrawings(queue):
+    """
+    Initializes a worker process of computeAllMATfromVecLDBatch to put the index of every
+    drawing it starts into queue.
+    """
+    global startedDrawingsQueue
+    startedDrawingsQueue = queue
+
+
+# The queue a worker process reports the drawings it starts to, see reportStartedDrawings
+startedDrawingsQueue = None
+
+
+def processVecLD(vecLD, cacheDir, prop, index=None):
+    """
+    Computes the medial axis properties of one drawing in a worker of computeAllMATfromVecLDBatch.
+
+    Returns:
+        tuple: (result, seconds, error), see computeAllMATfromVecLDBatch.
+    """
+    if index is not None and startedDrawingsQueue is not None:
+        startedDrawingsQueue.put(index)
+    start = time.perf_counter()
+    try:
+        result = computeAllMATfromVecLD(vecLD, cacheDir, headless=True, prop=prop)
+        error = None
+    except Exception:
+        result = None
+        error = traceback.format_exc()
+    return result, time.perf_counter() - start, error
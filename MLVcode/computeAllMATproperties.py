@@ -1,7 +1,12 @@
 import numpy as np
-from traceSkeleton import traceSkeleton # Need to add
-from computeMATproperty import computeMATproperty # Need to add
-from mapMATtoContour import mapMATtoContour 
+from MLVcode.traceSkeleton import traceSkeleton
+from MLVcode.computeMATproperty import computeMATproperty
+from MLVcode.mapMATtoContour import mapMATtoContour
+from MLVcode.computeMATpropertyPerBranch import MIRROR_UNAVAILABLE
+
+# The MAT properties computed by default. 'mirror' is left out until fitLineSegments, which it
+# needs, is available in Python.
+DEFAULT_MAT_PROPERTIES = ['parallelism', 'separation', 'taper']
 
 def computeAllMATproperties(MAT, imgLD, prop=None):
     """
@@ -15,16 +20,19 @@ def computeAllMATproperties(MAT, imgLD, prop=None):
       Options include:
       1. 'parallelism'
       2. 'separation'
-      3. 'mirror'
-      4. 'taper'
+      3. 'taper'
+      'mirror' is not available yet, since fitLineSegments has not been ported.
       If properties are given empty or None, the code produces three properties
-      ('parallelism', 'separation', 'mirror') by default.
+      ('parallelism', 'separation', 'taper', see DEFAULT_MAT_PROPERTIES) by default.
 
     Returns:
     - MATcontourImages: The contour images rated by the specific set of properties.
     - MATskeletonImages: The medial axis transform images rated by the specific set of properties.
     - skeletalBranches: The set of skeletal branches traced from the medial axis transform.
 
+    Raises:
+    - ValueError: If 'mirror' is requested, before any property is computed.
+
     Note:
     -----------------------------------------------------
     This function is part of the Mid Level Vision Toolbox:
@@ -39,18 +47,20 @@ def computeAllMATproperties(MAT, imgLD, prop=None):
     -----------------------------------------------------
     """
 
+    if not prop:
+        prop = DEFAULT_MAT_PROPERTIES
+    if 'mirror' in prop:
+        raise ValueError(MIRROR_UNAVAILABLE)
     skeletalBranches = traceSkeleton(MAT)
-    if prop is None:
-        prop = ['parallelism', 'separation', 'mirror']
 
+    MATskeletonImages = {}
+    MATcontourImages = {}
     for propertyInd in range(len(prop)):
         property = prop[propertyInd]
-        skeletonImageWithRating, skeletalBranches = computeMATproperty(MAT, prop, skeletalBranches)
+        skeletonImageWithRating, skeletalBranches = computeMATproperty(MAT, property, skeletalBranches)
         contourImageWithRating = mapMATtoContour(skeletalBranches, imgLD, skeletonImageWithRating)
-        MATskeletonImages = {}
-        MATskeletonImages[prop] = skeletonImageWithRating
-        MATcontourImages = {}
-        MATcontourImages[prop] = contourImageWithRating
+        MATskeletonImages[property] = skeletonImageWithRating
+        MATcontourImages[property] = contourImageWithRating
     
     return MATcontourImages, MATskeletonImages, skeletalBranches
 
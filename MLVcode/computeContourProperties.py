@@ -1,7 +1,4 @@
-from MLVcode.computeOrientation import computeOrientation
-from MLVcode.computeLength import computeLength
-from MLVcode.computeCurvature import computeCurvature
-from MLVcode.computeJunctions import computeJunctions
+from MLVcode.ensureContourProperties import ensureContourProperties
 # from computeOrientation import computeOrientation
 # from computeLength import computeLength
 # from computeCurvature import computeCurvature
@@ -22,6 +19,13 @@ def computeContourProperties(vecLD,
     Returns:
         LineDrawingStructure: A vector LD of structs with the requested contour properties added.
 
+    Notes:
+    - Each property is computed once per set of contours: calling the function again on the same
+      vecLD returns it as it is, and a property is only recomputed (together with the properties
+      derived from it) after the contours have changed (see ensureContourProperties).
+    - Properties that are needed for a requested one, e.g. orientation and length for curvature,
+      are computed along with it if vecLD does not have them yet.
+
     -----------------------------------------------------
     This function is part of the Mid Level Vision Toolbox:
     http://www.mlvtoolbox.org
@@ -37,16 +41,4 @@ def computeContourProperties(vecLD,
         
     if not isinstance(whichProps, (list, tuple)):
         whichProps = [whichProps]
-    for prop in range(len(whichProps)):
-        thisProp = whichProps[prop].lower()
-        if thisProp == 'orientation':
-            vecLD = computeOrientation(vecLD)
-        elif thisProp == 'length':
-            vecLD = computeLength(vecLD) 
-        elif thisProp == 'curvature':
-            vecLD = computeCurvature(vecLD) 
-        elif thisProp == 'junctions':
-            vecLD = computeJunctions(vecLD)
-        else:
-            raise ValueError('Unknown property: ' + thisProp)
-    return vecLD
\ No newline at end of file
+    return ensureContourProperties(vecLD, [prop.lower() for prop in whichProps], adoptExisting=False)
\ No newline at end of file
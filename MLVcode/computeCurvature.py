@@ -1,6 +1,7 @@
-import numpy as np
 from MLVcode.computeOrientation import computeOrientation
 from MLVcode.computeLength import computeLength
+from MLVcode.PackedLineDrawing import packContours, unpackContainer
+from MLVcode.computeSegmentProperties import computeSegmentCurvatures, splitByContour
 # from computeOrientation import computeOrientation
 
 def computeCurvature(vecLD):
@@ -35,24 +36,20 @@ def computeCurvature(vecLD):
 
 
     
+    # All segments of all contours at once; the orientations and lengths may come in any
+    # of the per-contour layouts of a vecLD (see PackedLineDrawing)
+    numContours = vecLD['numContours'][0][0]
+    _, contourStarts = packContours(vecLD['contours'][0][:numContours])
+    orientations, _ = packContours(unpackContainer(vecLD['orientations'])[0][:numContours], 1)
+    lengths, _ = packContours(unpackContainer(vecLD['lengths'])[0][:numContours], 1)
+    curvatures = computeSegmentCurvatures(orientations.ravel(), lengths.ravel(), contourStarts)
+
     vecLD['curvatures'] = []
-    for c in range(vecLD['numContours'][0][0]):
-        thisCon = vecLD['contours'][0][c]
-        numSegments = thisCon.shape[0]
-        vecLD['curvatures'].append([])
-        if numSegments == 1:
-            vecLD['curvatures'].pop()
+    for c, contourCurvatures in enumerate(splitByContour(curvatures, contourStarts)):
+        if contourStarts[c + 1] - contourStarts[c] == 1:
             vecLD['curvatures'].append(0) # Special case of only one straight segment
-            continue
-        for s in range(numSegments):
-            if s == numSegments-1:
-                s2 = s - 1 # for the last segment, we refer to the previous segment
-            else:
-                s2 = s + 1 # for all other segments, we refer to the next segment   
-            angleDiff = np.abs(vecLD['orientations'][c][s] - vecLD['orientations'][c][s2])
-            if angleDiff > 180:
-                angleDiff = 360 - angleDiff # For angles > 180, we take the opposite angle
-            vecLD['curvatures'][c].append(angleDiff / (vecLD['lengths'][0][c][s]+1e-10)) # Add a small number to avoid division by zero
+        else:
+            vecLD['curvatures'].append(list(contourCurvatures))
 
 
     return vecLD
\ No newline at end of file
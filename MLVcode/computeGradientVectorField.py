@@ -8,7 +8,8 @@ from MLVcode.load_mat import load_mat
 
 
 
-def computeGradientVectorField(binaryImage):
+def computeGradientVectorField(binaryImage, outerBoundary=None, showPlots=True, returnPlanes=False,
+                               headless=False, diagnostics=None):
     """
     Computes the gradient vector field of a binary image.
 
@@ -20,6 +21,19 @@ def computeGradientVectorField(binaryImage):
     Args:
         binaryImage (numpy.ndarray): A binary image where the objects are marked with 1's and 
         the background is marked with 0's.
+        outerBoundary (numpy.ndarray, optional): An array of shape (number of boundary points, 2)
+        with the (row, column) coordinates of the outer boundary of binaryImage. If None, the
+        boundary is loaded from 'outerBoundaryOriginal.mat'. Default is None.
+        showPlots (bool, optional): Whether to plot the histograms of the distance transforms.
+        Default is True.
+        returnPlanes (bool, optional): If True, IDX is returned as a (rows, cols) pair of int32
+        arrays with the row and column of the closest boundary point, which computeAOF accepts
+        directly. Default is False.
+        headless (bool, optional): If True, nothing is plotted, binaryImage is left unmodified and,
+        unless outerBoundary is given, the outer boundary is computed from binaryImage with
+        getOuterBoundary instead of being loaded from disk. Default is False.
+        diagnostics (callable, optional): Called as diagnostics(name, image) with the intermediate
+        distance transforms 'D1', 'D2' and their indices 'IDX1', 'IDX2'. Default is None.
 
     Returns:
         tuple: A tuple (D, IDX) where:
@@ -28,9 +42,11 @@ def computeGradientVectorField(binaryImage):
             IDX (numpy.ndarray): The combined distance transform.
 
     Notes:
-    - The function modifies the input binary image by converting 1s to 255s and vice versa.
-    - It loads an external file 'outerBoundaryOriginal.mat' for the outer boundary calculation.
-    - It plots histograms of the distance transforms.
+    - Unless headless is True, the function modifies the input binary image by converting 1s to 255s
+      and vice versa.
+    - Unless outerBoundary is given or headless is True, it loads an external file
+      'outerBoundaryOriginal.mat' for the outer boundary calculation.
+    - Unless showPlots is False or headless is True, it plots histograms of the distance transforms.
 
     -----------------------------------------------------
     This function is part of the Mid Level Vision Toolbox:
@@ -44,48 +60,75 @@ def computeGradientVectorField(binaryImage):
     Contact: dirk.walther@gmail.com
     -----------------------------------------------------
     """
+    if headless:
+        binaryImage = binaryImage.copy()
+        showPlots = False
     # Convert 1s to 255s
     binaryImage[binaryImage == 1] = 255
     newBinaryImage = binaryImage.copy()
     newBinaryImage[newBinaryImage == 255] = 1
 
-    outerBoundary, _ = getOuterBoundary(binaryImage, 0)
-    # Load outerBoundaryOriginal.mat
-
-    #######################################################
-    outerBoundary = load_mat('outerBoundaryOriginal.mat')
-    outerBoundary = outerBoundary['outerBoundary']
-    outerBoundary = outerBoundary - 1
-    #######################################################
-
-    for i in range(len(outerBoundary)):
-        newBinaryImage[int(outerBoundary[i, 0])][int(outerBoundary[i, 1])] = 1
-    D2, IDX2 = bwdist(newBinaryImage)
-    D1, IDX1 = bwdist(~binaryImage)
-
-    plt.figure(figsize=(15, 15))
-    plt.subplot(2, 2, 1)
-    plt.hist(IDX1.ravel(), bins=96, range=(0.0, 480000), fc='k', ec='k',color='blue')
-    plt.title("IDX1")
-    plt.subplot(2, 2, 2)
-    plt.hist(D2.ravel(), bins=2, range=(0.0, 2.0), fc='k', ec='k',color='blue')
-    plt.title("D2")
-    plt.subplot(2, 2, 3)
-    plt.hist(D1.ravel(), bins=86, range=(0.0, 256), fc='k', ec='k',color='blue')
-    plt.title("D1")
-    plt.subplot(2, 2, 4)
-    plt.hist(IDX2.ravel(), bins=96, range=(0.0, 480000), fc='k', ec='k',color='blue')
-    plt.title("IDX2")
-    plt.show()
+    if outerBoundary is None and headless:
+        # The objects are the 255 pixels, everything else is background
+        outerBoundary, _ = getOuterBoundary((binaryImage == 255).astype(np.uint8), 0)
+    elif outerBoundary is None:
+        outerBoundary, _ = getOuterBoundary(binaryImage, 0)
+        # Load outerBoundaryOriginal.mat
+
+        #######################################################
+        outerBoundary = load_mat('outerBoundaryOriginal.mat')
+        outerBoundary = outerBoundary['outerBoundary']
+        outerBoundary = outerBoundary - 1
+        #######################################################
+
+    boundaryRows = np.asarray(outerBoundary[:, 0]).astype(np.intp)
+    boundaryCols = np.asarray(outerBoundary[:, 1]).astype(np.intp)
+    newBinaryImage[boundaryRows, boundaryCols] = 1
+    if returnPlanes:
+        D2, rows2, cols2 = bwdist(newBinaryImage, returnPlanes=True, indexDtype=np.int32)
+        D1, rows1, cols1 = bwdist(~binaryImage, returnPlanes=True, indexDtype=np.int32)
+        if showPlots or diagnostics is not None:
+            IDX1 = np.ravel_multi_index((rows1, cols1), binaryImage.shape)
+            IDX2 = np.ravel_multi_index((rows2, cols2), binaryImage.shape)
+    else:
+        D2, IDX2 = bwdist(newBinaryImage)
+        D1, IDX1 = bwdist(~binaryImage)
+
+    if diagnostics is not None:
+        diagnostics('D1', D1)
+        diagnostics('D2', D2)
+        diagnostics('IDX1', IDX1)
+        diagnostics('IDX2', IDX2)
+    if showPlots:
+        plt.figure(figsize=(15, 15))
+        plt.subplot(2, 2, 1)
+        plt.hist(IDX1.ravel(), bins=96, range=(0.0, 480000), fc='k', ec='k',color='blue')
+        plt.title("IDX1")
+        plt.subplot(2, 2, 2)
+        plt.hist(D2.ravel(), bins=2, range=(0.0, 2.0), fc='k', ec='k',color='blue')
+        plt.title("D2")
+        plt.subplot(2, 2, 3)
+        plt.hist(D1.ravel(), bins=86, range=(0.0, 256), fc='k', ec='k',color='blue')
+        plt.title("D1")
+        plt.subplot(2, 2, 4)
+        plt.hist(IDX2.ravel(), bins=96, range=(0.0, 480000), fc='k', ec='k',color='blue')
+        plt.title("IDX2")
+        plt.show()
+
+    D = D1 - D2
+    if returnPlanes:
+        # A pixel is never at a positive distance in both transforms, so picking the
+        # nonzero one is the same as adding up the linear indices below
+        rows = np.where(D1 != 0, rows1, np.where(D2 != 0, rows2, 0)).astype(np.int32)
+        cols = np.where(D1 != 0, cols1, np.where(D2 != 0, cols2, 0)).astype(np.int32)
+        rows[boundaryRows, boundaryCols] = boundaryRows
+        cols[boundaryRows, boundaryCols] = boundaryCols
+        return D, (rows, cols)
 
     IDX1[D1 == 0] = 0
     IDX2[D2 == 0] = 0
     
     IDX = IDX1 + IDX2
 
-    for i in range(len(outerBoundary)):
-        linear_index = np.ravel_multi_index((int(outerBoundary[i, 0]), int(outerBoundary[i, 1])), IDX.shape)
-        IDX[int(outerBoundary[i, 0])][int(outerBoundary[i, 1])] = linear_index
-
-    D = D1 - D2
+    IDX[boundaryRows, boundaryCols] = np.ravel_multi_index((boundaryRows, boundaryCols), IDX.shape)
     return D, IDX
\ No newline at end of file
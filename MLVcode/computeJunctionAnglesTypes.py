@@ -1,4 +1,5 @@
 import numpy as np
+from MLVcode.PackedLineDrawing import unpackContainer
 
 
 def computeJunctionAnglesTypes(junctions, vec_ld):
@@ -34,6 +35,8 @@ def computeJunctionAnglesTypes(junctions, vec_ld):
     thresh = 2
     thresh_squared = thresh ** 2
     remove_junctions = []
+    # The orientations as flat float arrays, whether computed or loaded from a .mat file
+    orientations = [np.asarray(o, dtype=float).ravel() for o in unpackContainer(vec_ld['orientations'])[0]]
 
     for j in range(len(junctions)):
         junction = junctions[j]
@@ -52,20 +55,20 @@ def computeJunctionAnglesTypes(junctions, vec_ld):
 
             # Check proximity to segment endpoints
             if dist1 < thresh_squared:
-                junction_oris.append(vec_ld['orientations'][this_c][this_s] % 360)
+                junction_oris.append(orientations[this_c][this_s] % 360)
                 if this_s > 0:  # Check previous segment if exists
                     # Prevent double consideration of the segment if it was already processed
                     if not any((cid == this_c and sid == this_s - 1) for cid, sid in zip(junction['contourIDs'], junction['segmentIDs'])):
-                        prev_orientation = (vec_ld['orientations'][this_c][this_s-1] + 180) % 360
+                        prev_orientation = (orientations[this_c][this_s-1] + 180) % 360
                         junction_oris.append(prev_orientation)
 
             elif dist2 < thresh_squared:
-                next_orientation = (vec_ld['orientations'][this_c][this_s] + 180) % 360
+                next_orientation = (orientations[this_c][this_s] + 180) % 360
                 junction_oris.append(next_orientation)
                 if this_s + 1 < len(vec_ld['contours'][0][this_c]):  # Check next segment if exists
                     # Again, check if the segment has not been already considered
                     if not any((cid == this_c and sid == this_s + 1) for cid, sid in zip(junction['contourIDs'], junction['segmentIDs'])):
-                        junction_oris.append(vec_ld['orientations'][this_c][this_s+1] % 360)
+                        junction_oris.append(orientations[this_c][this_s+1] % 360)
 
             else:
                 orientation1 = np.degrees(np.arctan2(p[1] - this_seg[1], p[0] - this_seg[0])) % 360
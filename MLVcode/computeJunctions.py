@@ -37,9 +37,9 @@ def computeJunctions(vecLD):
     Contact: dirk.walther@gmail.com
     -----------------------------------------------------
     """
-    if not hasattr(vecLD, 'orientations'):
+    if 'orientations' not in vecLD:
         vecLD = computeOrientation(vecLD)
-    if not hasattr(vecLD, 'lengths'):
+    if 'lengths' not in vecLD:
         vecLD = computeLength(vecLD)
     
     # 3 Step Process
@@ -1,4 +1,5 @@
-import numpy as np
+from MLVcode.PackedLineDrawing import packContours
+from MLVcode.computeSegmentProperties import computeSegmentLengths, splitByContour, sumByContour
 
 def computeLength(vecLD):
     """
@@ -22,16 +23,11 @@ def computeLength(vecLD):
     Contact: dirk.walther@gmail.com
     -----------------------------------------------------
     """
-    vecLD['lengths'] = []
-    vecLD['contourLengths'] = []
-    for c in range(vecLD['numContours'][0][0]):
-        thisCon = vecLD['contours'][0][c]
-        val = np.sqrt((thisCon[:,2]-thisCon[:,0])**2+ (thisCon[:,3]-thisCon[:,1])**2)
-        vecLD['lengths'].append(np.array(val))
-        vecLD['contourLengths'].append([np.sum(val)]) # Need to verify this
-    vecLD['contourLengths'] = np.array(vecLD['contourLengths'])
-    # print("Contour Len: ", vecLD['contourLengths'])
-    # print("Lengths: ", vecLD['lengths'])
-    vecLD['lengths'] = [vecLD['lengths']]
-
-    return vecLD
\ No newline at end of file
+    # All segments of all contours at once
+    segments, contourStarts = packContours(vecLD['contours'][0][:vecLD['numContours'][0][0]])
+    lengths = computeSegmentLengths(segments)
+    vecLD['lengths'] = [splitByContour(lengths, contourStarts)]
+    vecLD['contourLengths'] = sumByContour(lengths, contourStarts).reshape((-1, 1))
+
+    return vecLD
+
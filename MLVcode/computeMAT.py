@@ -1,9 +1,22 @@
 import numpy as np
 from MLVcode.extract2DSkeletonFromBinaryImage import extract2DSkeletonFromBinaryImage
+from MLVcode.extract2DSkeletonFromBinaryImageTiled import extract2DSkeletonFromBinaryImageTiled
+from MLVcode.extract2DSkeletonFromBinaryImageInRegion import extract2DSkeletonFromBinaryImageInRegion
+from MLVcode.MATcache import MATcacheKey, loadMATfromCache, saveMATtoCache
 import scipy.io as sio
 
 def computeMAT(imgLD,
-               threshold_angle=28):
+               threshold_angle=28,
+               workers=1,
+               memoryBudget=None,
+               maxRadius=100,
+               outputDir=None,
+               headless=False,
+               diagnostics=None,
+               cacheDir=None,
+               maxCacheBytes=None,
+               previousMAT=None,
+               dirtyRegion=None):
     """
     Extracts the Medial Axis Transform from a given line drawing image (imgLD) and returns its distance map,
     its average out flux (AOF) map, and the skeleton.
@@ -11,6 +24,34 @@ def computeMAT(imgLD,
     Args:
         imgLD (ndarray): A line drawing image.
         threshold_angle (float, optional): Threshold on the object angle in degrees. Default is 28 degrees.
+        workers (int, optional): Number of worker processes used to compute the average outward flux. Default is 1.
+        memoryBudget (int, optional): If given, the MAT is computed in overlapping tiles whose working memory
+            stays roughly within this many bytes (see extract2DSkeletonFromBinaryImageTiled). Default is None
+            (no tiling).
+        maxRadius (float, optional): For tiled or incremental computation, the largest distance from the contours
+            in pixels for which the distance map and the flux are exact. Default is 100.
+        outputDir (str, optional): For tiled computation, a directory in which the outputs are created as
+            memory-mapped .npy files. Default is None (outputs are kept in memory).
+        headless (bool, optional): If True, nothing is plotted or printed, the outer boundary is computed
+            from imgLD instead of being loaded from 'outerBoundaryOriginal.mat', and 'MAT.mat' is not
+            written. Default is False.
+        diagnostics (callable, optional): Called as diagnostics(name, image) with intermediate images
+            (see extract2DSkeletonFromBinaryImage). Default is None.
+        cacheDir (str, optional): A directory used as a cache of computed MATs, keyed by a hash of the binary
+            image, threshold_angle and the number of flux samples. On a hit, the distance map and the flux
+            are memory-mapped from the cache and nothing is recomputed. The cache is not used when previousMAT
+            is given. Default is None (no cache).
+        maxCacheBytes (int, optional): The size limit of the cache directory in bytes. The least recently
+            used MATs are evicted beyond it. Default is None (no limit).
+        previousMAT (dict, optional): The MAT of an earlier version of imgLD. If given, only the neighbourhood
+            of dirtyRegion is recomputed and spliced into a copy of previousMAT (see
+            extract2DSkeletonFromBinaryImageInRegion). Default is None (the MAT is computed from scratch).
+        dirtyRegion (tuple, optional): With previousMAT, the box (r0, r1, c0, c1) of rows r0:r1 and columns
+            c0:c1 that contains all pixels in which imgLD differs from the earlier version (see getDirtyRegion).
+            Default is None (no pixel changed).
+
+    Raises:
+        ValueError: If both memoryBudget and previousMAT are given.
 
     Returns:
         dict: A dictionary with the following fields:
@@ -30,20 +71,38 @@ def computeMAT(imgLD,
     Contact: dirk.walther@gmail.com
     -----------------------------------------------------
     """
+    if memoryBudget is not None and previousMAT is not None:
+        raise ValueError('memoryBudget and previousMAT cannot be combined')
     binaryImage = imgLD
     # Define MAT which have three fields: skeleton, distance_map, AOF
     mat = {}
-    # aof = 2/pi * sin(Object_Angle)
-    if threshold_angle == 28:
-        threshold = 0.3
-    else:
-        threshold = 2/np.pi * np.sin(np.deg2rad(threshold_angle))
+    threshold = AOFthreshold(threshold_angle)
 
     # In case thw input image has three channels
     # if len(binaryImage.shape) == 3:
     #     binaryImage = cv2.cvtColor(binaryImage, cv2.COLOR_BGR2GRAY)
-    binaryImage = binaryImage[:,:,0]
-    fluxImage, skeletonImage, distImage, _ = extract2DSkeletonFromBinaryImage(binaryImage,threshold)
+    if binaryImage.ndim == 3:
+        binaryImage = binaryImage[:,:,0]
+    cached = None
+    # An incremental result depends on previousMAT as well, so it is neither read from nor
+    # written to the cache
+    useCache = cacheDir is not None and previousMAT is None
+    if useCache:
+        # extract2DSkeletonFromBinaryImage uses 60 samples on the sphere
+        key = MATcacheKey(binaryImage, threshold_angle, 60, headless=headless,
+                          maxRadius=None if memoryBudget is None else maxRadius)
+        cached = loadMATfromCache(cacheDir, key)
+    if cached is not None:
+        fluxImage, skeletonImage, distImage = cached['AOF'], cached['skeleton'], cached['distance_map']
+    elif previousMAT is not None:
+        fluxImage, skeletonImage, distImage, _ = extract2DSkeletonFromBinaryImageInRegion(
+            binaryImage, threshold, previousMAT, dirtyRegion, maxRadius, workers)
+    elif memoryBudget is None:
+        fluxImage, skeletonImage, distImage, _ = extract2DSkeletonFromBinaryImage(
+            binaryImage, threshold, workers, headless, diagnostics)
+    else:
+        fluxImage, skeletonImage, distImage, _ = extract2DSkeletonFromBinaryImageTiled(
+            binaryImage, threshold, memoryBudget, maxRadius, workers, outputDir)
     # extract2DSkeletonFromBinaryImage(binaryImage,threshold)
     # # Skeleton
     mat['skeleton'] = skeletonImage
@@ -53,7 +112,26 @@ def computeMAT(imgLD,
 
     # # Average outward flux map
     mat['AOF'] = fluxImage
+    if useCache and cached is None:
+        saveMATtoCache(cacheDir, key, mat, maxCacheBytes)
     # Save MAT as .mat file
-    sio.savemat('MAT.mat', mat)
+    if not headless:
+        sio.savemat('MAT.mat', mat)
     # Save AOFSkeleton as .mat file
-    return mat, fluxImage, skeletonImage, distImage
\ No newline at end of file
+    return mat, fluxImage, skeletonImage, distImage
+
+
+def AOFthreshold(threshold_angle):
+    """
+    Converts a threshold on the object angle in degrees into a threshold on the average outward flux.
+
+    Args:
+        threshold_angle (float): Threshold on the object angle in degrees.
+
+    Returns:
+        float: The flux threshold 2/pi * sin(threshold_angle), or 0.3 for the default angle of 28 degrees.
+    """
+    # aof = 2/pi * sin(Object_Angle)
+    if threshold_angle == 28:
+        return 0.3
+    return 2/np.pi * np.sin(np.deg2rad(threshold_angle))
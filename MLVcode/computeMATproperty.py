@@ -1,6 +1,7 @@
 import numpy as np
-from traceSkeleton import traceSkeleton
-from computeMATpropertyPerBranch import computeMATpropertyPerBranch
+from MLVcode.traceSkeleton import traceSkeleton
+from MLVcode.SkeletonGraph import SkeletonGraph
+from MLVcode.computeMATpropertyPerBranch import MIRROR_UNAVAILABLE
 
 def computeMATproperty(MAT, prop, skeletalBranches=None, K=5):
     """
@@ -8,9 +9,10 @@ def computeMATproperty(MAT, prop, skeletalBranches=None, K=5):
 
     Parameters:
     - MAT: Medial axis transform object.
-    - property (str): A string signaling the property that should be computed, one of: 'parallelism', 'separation', 'taper', 'mirror'.
-    - skeletalBranches: The medial axis skeleton. If this argument is
-                        omitted, skeletalBranches are computed using traceSkeleton.
+    - property (str): A string signaling the property that should be computed, one of: 'parallelism', 'separation', 'taper'.
+                      'mirror' is not available yet.
+    - skeletalBranches: The medial axis skeleton, either a list of branches or a SkeletonGraph.
+                        If this argument is omitted, skeletalBranches are computed using traceSkeleton.
                         Default is None.
     - K (int): The length of the window on the skeletal branch for computing
                the property. Default is 5.
@@ -18,9 +20,16 @@ def computeMATproperty(MAT, prop, skeletalBranches=None, K=5):
     Returns:
     - skeletonImageWithRating: The image of the medial axis skeleton with
                                the ratings specified by property encoded in the image pixels.
-    - skeletalBranches: The individual branches with their rating scores.
+    - skeletalBranches: The individual branches with their rating scores. For a list of
+                        branches, every branch gets the field prop; for a SkeletonGraph,
+                        the scores of all branch pixels are stored in properties[prop].
 
     Note:
+    All branches are computed at once, on the concatenated branch arrays (see
+    computeMATpropertyBatch).
+
+    Raises:
+    - ValueError: If prop is 'mirror' or unknown.
     -----------------------------------------------------
     This function is part of the Mid Level Vision Toolbox:
     http://www.mlvtoolbox.org
@@ -33,17 +42,126 @@ def computeMATproperty(MAT, prop, skeletalBranches=None, K=5):
     Contact: dirk.walther@gmail.com
     -----------------------------------------------------
     """
+    if prop == 'mirror':
+        raise ValueError(MIRROR_UNAVAILABLE)
     if skeletalBranches is None:
         skeletalBranches = traceSkeleton(MAT)
 
+    if isinstance(skeletalBranches, SkeletonGraph):
+        X, Y, R = skeletalBranches.X, skeletalBranches.Y, skeletalBranches.R
+        branchStarts = skeletalBranches.edgeStarts
+    else:
+        lengths = [len(branch['X']) for branch in skeletalBranches]
+        branchStarts = np.concatenate(([0], np.cumsum(lengths, dtype=np.int64)))
+        X, Y, R = [np.concatenate([np.asarray(branch[key]) for branch in skeletalBranches])
+                   if len(skeletalBranches) > 0 else np.zeros(0, dtype=np.int64)
+                   for key in ('X', 'Y', 'R')]
+
+    scores = computeMATpropertyBatch(X, Y, R, branchStarts, prop, K)
+
+    # Pixels shared by several branches get the score of the last branch
     skeletonImageWithRating = np.zeros(MAT['skeleton'].shape)
+    skeletonImageWithRating[Y, X] = scores
+
+    if isinstance(skeletalBranches, SkeletonGraph):
+        skeletalBranches.properties[prop] = scores
+    else:
+        for i in range(len(skeletalBranches)):
+            skeletalBranches[i][prop] = scores[branchStarts[i]:branchStarts[i + 1]]
+
+    return skeletonImageWithRating, skeletalBranches
+
+
+def computeMATpropertyBatch(X, Y, R, branchStarts, prop, K=5):
+    """
+    Computes a MAT property for all skeletal branches at once.
+
+    The branches are given as concatenated arrays with offsets. Every step of
+    computeMATpropertyPerBranch (smoothing, derivatives, windowed sums) is carried out on the
+    concatenated arrays, with all windows clipped at the ends of their branch, so that the
+    result equals that of computeMATpropertyPerBranch for every branch.
+
+    Args:
+        X (numpy.ndarray): The x-coordinates of the points of all branches.
+        Y (numpy.ndarray): The y-coordinates of the points of all branches.
+        R (numpy.ndarray): The radius values of the points of all branches.
+        branchStarts (numpy.ndarray): Offsets of the branches, one more than there are
+            branches. Branch i covers branchStarts[i]:branchStarts[i+1].
+        prop (str): One of 'parallelism', 'separation' or 'taper'.
+        K (int, optional): The largest half-width of the window. Default is 5.
+
+    Returns:
+        numpy.ndarray: The scores of all points, in the order of X.
+
+    Raises:
+        ValueError: If prop is not one of the supported properties.
+    """
+    branchStarts = np.asarray(branchStarts, dtype=np.int64)
+    lengths = np.diff(branchStarts)
+    N = int(branchStarts[-1])
+    branchOf = np.repeat(np.arange(len(lengths)), lengths)
+    first = branchStarts[:-1][branchOf]
+    last = branchStarts[1:][branchOf] - 1
+    position = np.arange(N) - first
 
-    for i in range(len(skeletalBranches)):
-        scores = computeMATpropertyPerBranch(skeletalBranches[i], prop, K)
-        skeletalBranches[i][prop] = scores
-        
-        # Convert branch coordinates (X, Y) to linear indices and update the image
-        curBranchInds = np.ravel_multi_index((skeletalBranches['Y'], skeletalBranches['X']), MAT['skeleton'].shape) # Check this line
-        skeletonImageWithRating[curBranchInds] = scores
+    R = segmentMovingMean(np.asarray(R, dtype=float), first, last, 3)
+    dX = segmentDiff(np.asarray(X, dtype=float), first, last)
+    dY = segmentDiff(np.asarray(Y, dtype=float), first, last)
+    dR = segmentDiff(R, first, last)
 
-    return skeletonImageWithRating, skeletalBranches
\ No newline at end of file
+    if prop == 'separation':
+        result = 1.0 - 1.0/R
+    elif prop in ('parallelism', 'taper'):
+        if prop == 'taper':
+            dR = segmentMovingMean(dR, first, last, 3)
+        skeletalAxisLength = segmentCumsum(np.sqrt(dX**2 + dY**2), branchStarts, lengths)
+        arcLengthVar = segmentCumsum(np.sqrt(dX**2 + dY**2 + dR**2), branchStarts, lengths)
+
+        # The windows of the inner points of each branch, as in windowedRatio
+        result = np.zeros(N)
+        inner = (position >= 1) & (position <= last - first - 1)
+        i = np.flatnonzero(inner)
+        eK = np.minimum(np.minimum(K, position[i] - 1), last[i] - i)
+        nomPrefix = np.concatenate(([0.0], np.cumsum(skeletalAxisLength)))
+        denomPrefix = np.concatenate(([0.0], np.cumsum(arcLengthVar)))
+        result[i] = (nomPrefix[i+eK+1] - nomPrefix[i-eK]) / (denomPrefix[i+eK+1] - denomPrefix[i-eK])
+    else:
+        raise ValueError('Unknown property: ' + prop)
+
+    result = segmentMovingMean(result, first, last, 3)
+    return np.power(result, 10)
+
+
+def segmentMovingMean(A, first, last, window):
+    """
+    Moving mean of concatenated branches, like smoothData on every branch. first and last
+    hold the index of the first and the last point of the branch of every point.
+    """
+    before = window // 2
+    after = window - 1 - before
+    index = np.arange(len(A))
+    lo = np.maximum(index - before, first)
+    hi = np.minimum(index + after, last)
+    prefix = np.concatenate(([0.0], np.cumsum(A)))
+    return (prefix[hi + 1] - prefix[lo]) / (hi - lo + 1)
+
+
+def segmentDiff(A, first, last):
+    """
+    Differences of concatenated branches, like getBranchDerivative: the last point of a branch
+    repeats the difference before it, and branches with a single point get 0.
+    """
+    index = np.arange(len(A))
+    # The last point takes the difference of the two points before it
+    lo = np.where(index == last, np.maximum(index - 1, first), index)
+    hi = np.minimum(lo + 1, last)
+    return A[hi] - A[lo]
+
+
+def segmentCumsum(A, branchStarts, lengths):
+    """
+    Cumulative sum of concatenated branches, restarting at the first point of every branch.
+    """
+    total = np.cumsum(A)
+    offsets = np.concatenate(([0.0], total))[branchStarts[:-1]]
+    return total - np.repeat(offsets, lengths)
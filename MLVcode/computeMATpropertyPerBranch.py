@@ -1,8 +1,11 @@
 import numpy as np
-from getBranchDerivative import getBranchDerivative # Need to add
-from fitLineSegments import fitLineSegments # Need to add
-from smoothData import smoothData # Need to add
-from diff import diff # Need to add
+from MLVcode.getBranchDerivative import getBranchDerivative
+from MLVcode.smoothData import smoothData
+from MLVcode.diff import diff
+
+# 'mirror' needs fitLineSegments to compute the curvature of the medial axis, which has not
+# been ported from the MATLAB toolbox yet
+MIRROR_UNAVAILABLE = "The MAT property 'mirror' is not available: fitLineSegments has not been ported yet"
 
 def computeMATpropertyPerBranch(curBranch, prop, K=5):
     """
@@ -11,7 +14,7 @@ def computeMATpropertyPerBranch(curBranch, prop, K=5):
     Parameters:
     - curBranch: The skeletal branch for which the property should be computed.
     - property (str): A string signaling the property that should be computed,
-                      one of: 'parallelism', 'separation', 'taper', 'mirror'.
+                      one of: 'parallelism', 'separation', 'taper'. 'mirror' is not available yet.
     - K (int, optional): The length of the window on the skeletal branch for computing
                          the property. Default is 5.
 
@@ -42,17 +45,12 @@ def computeMATpropertyPerBranch(curBranch, prop, K=5):
 
     if prop == 'parallelism':
         # This is computing the first derivative of the arc length
-        skeletalAxisLength = np.cumsum(np.sqrt(dX**2 + dY**2)) # Check if dX, dY was an array or single value
+        skeletalAxisLength = np.cumsum(np.sqrt(dX**2 + dY**2))
         arcLengthVar = np.cumsum(np.sqrt(dX**2 + dY**2 + dR**2))
 
         if N >= 3:
-            for i in range(1, N-1):
-               # Effective K
-                eK = min(K, i-1, N-i-1) # Check
-                nom = np.sum(skeletalAxisLength[i-eK:i+eK+1])
-                denom = np.sum(arcLengthVar[i-eK:i+eK+1])
-                result[i] = nom / denom
-        
+            result[1:N-1] = windowedRatio(skeletalAxisLength, arcLengthVar, K)
+
     elif prop == 'separation':
         # This is computing the inverse of the radius function
         result = 1.0 - 1.0/R
@@ -62,8 +60,7 @@ def computeMATpropertyPerBranch(curBranch, prop, K=5):
         dR = smoothData(dR)
         ddR = diff(dR)
         if(len(ddR) >= 1):
-            # newddR = np.insert(ddR, 0, ddR[0]) # Need to fix this
-            newddR = np.append(newddR, ddR[-1])
+            newddR = np.append(ddR, ddR[-1])
         else:
             newddR = dR
         ddT = newddR
@@ -73,18 +70,10 @@ def computeMATpropertyPerBranch(curBranch, prop, K=5):
         arcLengthVar = np.cumsum(np.sqrt(dX**2 + dY**2 + dR**2))
 
         if N >= 3:
-            for i in range(1, N-1):
-                eK = min(K, i-1, N-i-1)
-                nom = np.sum(skeletalAxisLength[i-eK:i+eK+1])
-                denom = np.sum(arcLengthVar[i-eK:i+eK+1])
-                result[i] = nom / denom
+            result[1:N-1] = windowedRatio(skeletalAxisLength, arcLengthVar, K)
 
     elif prop == 'mirror':
-        # Computing curvature of the medial axis
-        X = curBranch['X']
-        Y = curBranch['Y']
-        if len(X) >= 3:
-            result = fitLineSegments([X, Y])
+        raise ValueError(MIRROR_UNAVAILABLE)
     else:
         raise ValueError('Unknown property: ' + prop)
     
@@ -94,3 +83,25 @@ def computeMATpropertyPerBranch(curBranch, prop, K=5):
     return result
 
 
+def windowedRatio(nom, denom, K):
+    """
+    Computes the ratio of the window sums of nom and denom for the inner points of a branch.
+
+    For every point i from 1 to N-2 the window covers the points i-eK to i+eK, with the
+    effective window half-width eK = min(K, i-1, N-i-1), so that it always stays inside the
+    branch. All window sums are taken from the prefix sums of nom and denom at once.
+
+    Args:
+        nom (numpy.ndarray): The values summed for the numerator, one per point of the branch.
+        denom (numpy.ndarray): The values summed for the denominator.
+        K (int): The largest half-width of the window.
+
+    Returns:
+        numpy.ndarray: The N-2 ratios for the points 1 to N-2.
+    """
+    N = len(nom)
+    i = np.arange(1, N-1)
+    eK = np.minimum(np.minimum(K, i-1), N-i-1)
+    nomPrefix = np.concatenate(([0.0], np.cumsum(nom)))
+    denomPrefix = np.concatenate(([0.0], np.cumsum(denom)))
+    return (nomPrefix[i+eK+1] - nomPrefix[i-eK]) / (denomPrefix[i+eK+1] - denomPrefix[i-eK])
@@ -0,0 +1,66 @@
+from MLVcode.computeMAT import AOFthreshold
+from MLVcode.extract2DSkeletonFromBinaryImage import extract2DSkeletonFromBinaryImage, thresholdFluxImage, \
+    getAreaThreshold
+
+
+def computeMATsweep(imgLD,
+                    threshold_angles,
+                    workers=1,
+                    headless=False,
+                    diagnostics=None):
+    """
+    Extracts Medial Axis Transforms of a line drawing image for several threshold angles at once.
+
+    The distance map and the average outward flux (AOF) map do not depend on the threshold angle,
+    so they are computed only once. The skeleton is then extracted from the unmodified flux image
+    for every threshold angle.
+
+    Args:
+        imgLD (ndarray): A line drawing image.
+        threshold_angles (list of float): Thresholds on the object angle in degrees.
+        workers (int, optional): Number of worker processes used to compute the average outward flux. Default is 1.
+        headless (bool, optional): If True, nothing is plotted or printed and the outer boundary is computed
+            from imgLD (see computeMAT). Default is False.
+        diagnostics (callable, optional): Called as diagnostics(name, image) with intermediate images
+            (see extract2DSkeletonFromBinaryImage). Default is None.
+
+    Returns:
+        list of dict: One MAT per threshold angle, in the order of threshold_angles, each with the fields:
+            - 'skeleton' (ndarray): A binary image the same size as imgLD. 1s represent where the skeleton appears.
+            - 'distance_map' (ndarray): A distance-transformed image of the same size as imgLD.
+            - 'AOF' (ndarray): Average outward flux image computed from the distance transform.
+            - 'threshold_angle' (float): The threshold angle of this skeleton.
+        'distance_map' and 'AOF' are the same arrays in all MATs.
+
+    -----------------------------------------------------
+    This function is part of the Mid Level Vision Toolbox:
+    http://www.mlvtoolbox.org
+
+    Python Implementation: Aravind Narayanan
+    Original MATLAB Implementation: Dirk Bernhardt-Walther
+    Copyright: Dirk Bernhardt-Walther
+    University of Toronto, Toronto, Ontario, Canada, 2024
+
+    Contact: dirk.walther@gmail.com
+    -----------------------------------------------------
+    """
+    binaryImage = imgLD
+    if binaryImage.ndim == 3:
+        binaryImage = binaryImage[:,:,0]
+    threshold_angles = list(threshold_angles)
+    if len(threshold_angles) == 0:
+        return []
+
+    fluxImage, skeletonImage, distImage, _ = extract2DSkeletonFromBinaryImage(
+        binaryImage, AOFthreshold(threshold_angles[0]), workers, headless, diagnostics)
+
+    mats = []
+    for t, threshold_angle in enumerate(threshold_angles):
+        if t > 0:
+            skeletonImage, _ = thresholdFluxImage(fluxImage, AOFthreshold(threshold_angle), 60,
+                                                  getAreaThreshold(binaryImage.shape), distImage)
+        mats.append({'skeleton': skeletonImage,
+                     'distance_map': distImage,
+                     'AOF': fluxImage,
+                     'threshold_angle': threshold_angle})
+    return mats
@@ -1,4 +1,5 @@
-import numpy as np
+from MLVcode.PackedLineDrawing import packContours
+from MLVcode.computeSegmentProperties import computeSegmentOrientations, splitByContour
 
 def computeOrientation(vecLD):
     """
@@ -25,10 +26,7 @@ def computeOrientation(vecLD):
     Contact: dirk.walther@gmail.com
     -----------------------------------------------------
     """
-    vecLD['orientations'] = []
-    for c in range(vecLD['numContours'][0][0]):
-        thisCon = vecLD['contours'][0][c]
-        ori = np.mod(np.degrees(np.arctan2(thisCon[:,1].astype(np.int32) - thisCon[:,3].astype(np.int32), 
-                                           thisCon[:,2].astype(np.int32) - thisCon[:,0].astype(np.int32))), 360)
-        vecLD['orientations'].append(ori)
+    # All segments of all contours at once
+    segments, contourStarts = packContours(vecLD['contours'][0][:vecLD['numContours'][0][0]])
+    vecLD['orientations'] = splitByContour(computeSegmentOrientations(segments), contourStarts)
     return vecLD
\ No newline at end of file
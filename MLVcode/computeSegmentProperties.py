@@ -0,0 +1,96 @@
+import numpy as np
+
+def computeSegmentProperties(segments, contourStarts):
+    """
+    Computes the orientation, length and curvature of all line segments of a drawing at once.
+
+    The segments of all contours are given as one flat array with contour offsets, as in
+    PackedLineDrawing. The values are the same as those of computeOrientation, computeLength
+    and computeCurvature, but as flat arrays aligned with segments. They can be split into
+    per-contour arrays with splitByContour.
+
+    Args:
+        segments (numpy.ndarray): The (S, 4) line segments x1, y1, x2, y2 of all contours.
+        contourStarts (numpy.ndarray): The offsets of the contours into segments, one more
+            than there are contours.
+
+    Returns:
+        tuple: A tuple (orientations, lengths, curvatures) of float arrays with S values each, where:
+            orientations (numpy.ndarray): The orientations in degrees, from 0 to 360.
+            lengths (numpy.ndarray): The lengths of the segments.
+            curvatures (numpy.ndarray): The curvatures, 0 for contours with a single segment.
+
+    -----------------------------------------------------
+    This function is part of the Mid Level Vision Toolbox:
+    http://www.mlvtoolbox.org
+
+    Python Implementation: Aravind Narayanan
+    Original MATLAB Implementation: Dirk Bernhardt-Walther
+    Copyright: Dirk Bernhardt-Walther
+    University of Toronto, Toronto, Ontario, Canada, 2024
+
+    Contact: dirk.walther@gmail.com
+    -----------------------------------------------------
+    """
+    orientations = computeSegmentOrientations(segments)
+    lengths = computeSegmentLengths(segments)
+    curvatures = computeSegmentCurvatures(orientations, lengths, contourStarts)
+    return orientations, lengths, curvatures
+
+
+def computeSegmentOrientations(segments):
+    """
+    Returns the orientation from 0 to 360 degrees of every segment, from its end points
+    truncated to integers as in computeOrientation.
+    """
+    segments = np.asarray(segments).reshape((-1, 4))
+    x1, y1, x2, y2 = (segments[:, k].astype(np.int32) for k in range(4))
+    return np.mod(np.degrees(np.arctan2(y1 - y2, x2 - x1)), 360)
+
+
+def computeSegmentLengths(segments):
+    """
+    Returns the length of every segment.
+    """
+    segments = np.asarray(segments, dtype=np.float64).reshape((-1, 4))
+    return np.sqrt((segments[:, 2] - segments[:, 0])**2 + (segments[:, 3] - segments[:, 1])**2)
+
+
+def computeSegmentCurvatures(orientations, lengths, contourStarts):
+    """
+    Returns the curvature of every segment: the change in orientation to the next segment of
+    its contour (to the previous one for the last segment), divided by its length. Segments
+    that are the only one of their contour get 0.
+    """
+    contourStarts = np.asarray(contourStarts, dtype=np.int64)
+    S = len(orientations)
+    index = np.arange(S)
+    counts = np.diff(contourStarts)
+    last = np.repeat(contourStarts[1:] - 1, counts)
+    other = np.where(index == last, index - 1, index + 1)
+    single = np.repeat(counts == 1, counts)
+    other[single] = index[single]
+
+    angleDiff = np.abs(orientations - orientations[other]) if S > 0 else np.zeros(0)
+    # For angles > 180, we take the opposite angle
+    angleDiff = np.where(angleDiff > 180, 360 - angleDiff, angleDiff)
+    # Add a small number to avoid division by zero
+    curvatures = angleDiff / (lengths + 1e-10)
+    curvatures[single] = 0
+    return curvatures
+
+
+def splitByContour(values, contourStarts):
+    """
+    Splits a flat per-segment array into a list of per-contour views.
+    """
+    starts = np.asarray(contourStarts).tolist()
+    return [values[start:stop] for start, stop in zip(starts[:-1], starts[1:])]
+
+
+def sumByContour(values, contourStarts):
+    """
+    Sums a flat per-segment array over the segments of every contour.
+    """
+    contourOf = np.repeat(np.arange(len(contourStarts) - 1), np.diff(contourStarts))
+    return np.bincount(contourOf, weights=values, minlength=len(contourStarts) - 1)
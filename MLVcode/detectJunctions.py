@@ -1,7 +1,12 @@
 import numpy as np
 import math
 import warnings
-from MLVcode.lineIntersection import lineIntersection
+from MLVcode.lineIntersection import lineIntersectionBatch
+from MLVcode.PackedLineDrawing import packContours
+
+# Extra padding of the segment boxes in pixels per pixel of segment extent, which covers the
+# rounding of the intersection test in lineIntersection
+BOX_SLACK = 1e-6
 
 
 def detectJunctions(vec_ld, ae=1, re=0.3):
@@ -33,6 +38,12 @@ def detectJunctions(vec_ld, ae=1, re=0.3):
     - This function is a part of junction detection in vectorized line drawings. Further processing 
       might be necessary to refine or clean up the detected junctions.
     - For junction detection, the minimum of AE and RE measures is used.
+    - Two segments can only form a junction if their bounding boxes overlap once each box is
+      extended by the gap that lineIntersection tolerates for the segment, min(AE, RE times its
+      extent). Only these pairs are tested, found with a uniform grid over the boxes (see
+      findCandidatePairs), and all of them at once with lineIntersectionBatch. The junctions
+      are the same, and in the same order, as with testing every pair of segments of
+      different contours.
 
     -----------------------------------------------------
     This function is part of the Mid Level Vision Toolbox:
@@ -47,29 +58,85 @@ def detectJunctions(vec_ld, ae=1, re=0.3):
     -----------------------------------------------------
     """
     junctions = []
+    numContours = vec_ld['numContours'][0][0]
+    segments, contourStarts = packContours([vec_ld['contours'][0][c] for c in range(numContours)])
+    counts = np.diff(contourStarts)
+    contourOf = np.repeat(np.arange(numContours), counts)
+    segmentIn = np.arange(len(segments)) - np.repeat(contourStarts[:-1], counts)
+
+    # Ignore too short curves
+    tooShort = np.array([vec_ld['contourLengths'][c][0] < ae for c in range(numContours)], dtype=bool)
+    candidates = np.flatnonzero(~tooShort[contourOf])
+
+    queries, refs = findCandidatePairs(getSegmentBoxes(segments[candidates], ae, re), contourOf[candidates])
+    queries, refs = candidates[queries], candidates[refs]
+    positions, valid = lineIntersectionBatch(segments[queries], segments[refs], re, ae)
+    for position, query, ref in zip(positions[valid], queries[valid].tolist(), refs[valid].tolist()):
+        junction = {
+            'position': position,
+            'contourIDs': [int(contourOf[query]), int(contourOf[ref])],
+            'segmentIDs': [int(segmentIn[query]), int(segmentIn[ref])]
+        }
+        junctions.append(junction)
 
-    for query_c in range(vec_ld['numContours'][0][0]):
-        if vec_ld['contourLengths'][query_c][0] < ae:  # Ignore too short curves
-            continue
-        
-        query_curve = vec_ld['contours'][0][query_c]
-        for query_s in range(len(query_curve)):
-            for ref_c in range(query_c + 1, vec_ld['numContours'][0][0]):
-                if vec_ld['contourLengths'][ref_c][0] < ae:  # Ignore too short curves
-                    continue
-                
-                ref_curve = vec_ld['contours'][0][ref_c]
-                
-                for ref_s in range(len(ref_curve)):
-                    position = lineIntersection(query_curve[query_s].astype(float), ref_curve[ref_s].astype(float), re, ae)
-                    
-                    if position is not None:
-                        junction = {
-                            'position': position,
-                            'contourIDs': [query_c, ref_c],
-                            'segmentIDs': [query_s, ref_s]
-                        }
-                        junctions.append(junction)
-    
     return junctions
 
+
+def getSegmentBoxes(segments, ae, re):
+    """
+    Returns the (S, 4) bounding boxes xmin, ymin, xmax, ymax of the segments, extended by the
+    gap that lineIntersection tolerates beyond the ends of each segment.
+    """
+    extent = np.maximum(np.abs(segments[:, 2] - segments[:, 0]), np.abs(segments[:, 3] - segments[:, 1]))
+    pad = np.minimum(ae, re * extent) + BOX_SLACK * (extent + 1)
+    lower = np.minimum(segments[:, :2], segments[:, 2:]) - pad[:, None]
+    upper = np.maximum(segments[:, :2], segments[:, 2:]) + pad[:, None]
+    return np.hstack((lower, upper))
+
+
+def findCandidatePairs(boxes, contourOf):
+    """
+    Finds all pairs of overlapping boxes that belong to different contours.
+
+    Every box is entered into the cells of a uniform grid that it covers, with the mean box size
+    as the cell size. Boxes that share a cell are compared.
+
+    Args:
+        boxes (numpy.ndarray): The (S, 4) boxes xmin, ymin, xmax, ymax, ordered by contour.
+        contourOf (numpy.ndarray): The contour of every box.
+
+    Returns:
+        tuple: Two arrays (first, second) of box indices with first < second, sorted by first
+        and then by second.
+    """
+    none = (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+    if len(boxes) < 2:
+        return none
+    cellSize = max(np.mean(np.maximum(boxes[:, 2] - boxes[:, 0], boxes[:, 3] - boxes[:, 1])), 1.0)
+    cells = np.floor((boxes - np.tile(boxes[:, :2].min(axis=0), 2)) / cellSize).astype(np.int64)
+    width = cells[:, 2] - cells[:, 0] + 1
+    numCells = width * (cells[:, 3] - cells[:, 1] + 1)
+
+    # One entry per box and cell it covers
+    box = np.repeat(np.arange(len(boxes)), numCells)
+    offset = np.arange(len(box)) - np.repeat(np.cumsum(numCells) - numCells, numCells)
+    column = cells[box, 0] + offset % width[box]
+    row = cells[box, 1] + offset // width[box]
+    key = column * (cells[:, 3].max() + 1) + row
+    order = np.argsort(key, kind='stable')
+    box, key = box[order], key[order]
+
+    # Every entry paired with the later entries of its cell
+    cellEnd = np.searchsorted(key, key, side='right')
+    numPairs = cellEnd - np.arange(len(key)) - 1
+    first = np.repeat(np.arange(len(key)), numPairs)
+    second = first + 1 + np.arange(len(first)) - np.repeat(np.cumsum(numPairs) - numPairs, numPairs)
+    first, second = box[first], box[second]
+
+    keep = contourOf[first] != contourOf[second]
+    keep[keep] = np.all(boxes[first[keep], :2] <= boxes[second[keep], 2:], axis=1) \
+        & np.all(boxes[second[keep], :2] <= boxes[first[keep], 2:], axis=1)
+    if not np.any(keep):
+        return none
+    pairs = np.unique(first[keep] * len(boxes) + second[keep])
+    return pairs // len(boxes), pairs % len(boxes)
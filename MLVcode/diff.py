@@ -0,0 +1,30 @@
+import numpy as np
+
+def diff(X, n=1):
+    """
+    Computes the differences between consecutive elements of a vector, like MATLAB's diff(X, n).
+
+    Args:
+        X (array_like): The data, a vector or a scalar.
+        n (int, optional): The order of the difference. Default is 1.
+
+    Returns:
+        numpy.ndarray: A float vector with n elements fewer than X, or an empty vector
+        if X has no more than n elements.
+
+    -----------------------------------------------------
+    This function is part of the Mid Level Vision Toolbox:
+    http://www.mlvtoolbox.org
+
+    Python Implementation: Aravind Narayanan
+    Original MATLAB Implementation: Dirk Bernhardt-Walther
+    Copyright: Dirk Bernhardt-Walther
+    University of Toronto, Toronto, Ontario, Canada, 2024
+
+    Contact: dirk.walther@gmail.com
+    -----------------------------------------------------
+    """
+    X = np.atleast_1d(np.asarray(X, dtype=float)).ravel()
+    if len(X) <= n:
+        return np.zeros(0)
+    return np.diff(X, n)
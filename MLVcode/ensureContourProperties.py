@@ -0,0 +1,181 @@
+import hashlib
+from collections import OrderedDict
+import numpy as np
+from MLVcode.computeOrientation import computeOrientation
+from MLVcode.computeLength import computeLength
+from MLVcode.computeCurvature import computeCurvature
+from MLVcode.computeJunctions import computeJunctions
+
+# The contour properties: the properties they are derived from, the function that
+# computes them and the fields of vecLD that this function fills in
+CONTOUR_PROPERTIES = {
+    'orientation': ((), computeOrientation, ('orientations',)),
+    'length': ((), computeLength, ('lengths', 'contourLengths')),
+    'curvature': (('orientation', 'length'), computeCurvature, ('curvatures',)),
+    'junctions': (('orientation', 'length'), computeJunctions, ('junctions',)),
+}
+
+# The computed properties and memoized histograms of the most recently used drawings, keyed by
+# id(vecLD). They are kept outside of vecLD, so that vecLD can still be saved with savemat and is
+# not weighed down when it is pickled. An entry only applies to a drawing that still holds the
+# very field objects recorded in it (see propertyFieldsUnchanged), so a dict that reuses the id of
+# a discarded one does not inherit its record.
+CONTOUR_PROPERTY_MEMO = OrderedDict()
+MEMO_SIZE = 64
+
+
+def ensureContourProperties(vecLD, whichProps, adoptExisting=True):
+    """
+    Makes sure that contour properties of a vectorized line drawing are computed and up to date.
+
+    Every property is computed on first request, after the properties it is derived from
+    (see CONTOUR_PROPERTIES), and at most once for the same contours: a fingerprint of the
+    contours (see contourFingerprint) is recorded with every property that is computed, in a
+    memo outside of vecLD. A property is only computed again once the contours, their number
+    or the image size have changed, or its fields have been replaced, and then so are all
+    properties derived from it. The contour histograms of the get*Stats functions are memoized
+    in the same way (see getCachedContourStats).
+
+    Args:
+        vecLD (dict): The vectorized line drawing data structure.
+        whichProps (list of str): The properties to provide, out of 'orientation', 'length',
+            'curvature' and 'junctions'.
+        adoptExisting (bool, optional): If True, fields that vecLD already has without a record
+            of their computation, e.g. from a line drawing loaded from a .mat file, are kept as
+            they are. If False, the requested properties are computed once in this case as well;
+            the properties they are derived from are still kept. Default is True.
+
+    Returns:
+        dict: vecLD with the requested properties.
+
+    Raises:
+        ValueError: If one of whichProps is unknown.
+
+    -----------------------------------------------------
+    This function is part of the Mid Level Vision Toolbox:
+    http://www.mlvtoolbox.org
+
+    Python Implementation: Aravind Narayanan
+    Original MATLAB Implementation: Dirk Bernhardt-Walther
+    Copyright: Dirk Bernhardt-Walther
+    University of Toronto, Toronto, Ontario, Canada, 2024
+
+    Contact: dirk.walther@gmail.com
+    -----------------------------------------------------
+    """
+    fingerprint = contourFingerprint(vecLD)
+    state = getMemoEntry(vecLD)['properties']
+    for prop in whichProps:
+        vecLD = ensureContourProperty(vecLD, prop.lower(), fingerprint, state, adoptExisting)
+    return vecLD
+
+
+def ensureContourProperty(vecLD, prop, fingerprint, state, adoptExisting):
+    """
+    Provides one property and the properties it is derived from, see ensureContourProperties.
+    """
+    if prop not in CONTOUR_PROPERTIES:
+        raise ValueError('Unknown property: ' + prop)
+    dependencies, compute, fields = CONTOUR_PROPERTIES[prop]
+    if prop in state and state[prop][0] == fingerprint and propertyFieldsUnchanged(vecLD, state[prop][1]):
+        return vecLD
+    for dependency in dependencies:
+        vecLD = ensureContourProperty(vecLD, dependency, fingerprint, state, True)
+    if not (adoptExisting and prop not in state and all(field in vecLD for field in fields)):
+        vecLD = compute(vecLD)
+        markDerivedStale(getMemoEntry(vecLD), prop)
+    state[prop] = (fingerprint, {field: vecLD[field] for field in fields})
+    return vecLD
+
+
+def markDerivedStale(entry, prop):
+    """
+    Marks the properties derived from prop as outdated, so that they are computed again rather
+    than adopted, and forgets all memoized histograms.
+    """
+    state = entry['properties']
+    for other, (dependencies, _, _) in CONTOUR_PROPERTIES.items():
+        if prop in dependencies and other in state:
+            state[other] = (None, {})
+            markDerivedStale(entry, other)
+    entry['stats'].clear()
+
+
+def invalidateContourProperties(vecLD):
+    """
+    Forgets which properties and histograms were computed, so that all of them are computed again
+    on their next request. Needed only when derived fields such as 'orientations' are changed in place.
+    """
+    CONTOUR_PROPERTY_MEMO.pop(id(vecLD), None)
+    return vecLD
+
+
+def getMemoEntry(vecLD):
+    """
+    Returns the memo entry of vecLD, a dict with the computed 'properties' and the memoized
+    'stats', and creates it if needed. The least recently used entries beyond MEMO_SIZE are
+    forgotten.
+    """
+    key = id(vecLD)
+    entry = CONTOUR_PROPERTY_MEMO.get(key)
+    if entry is None:
+        entry = CONTOUR_PROPERTY_MEMO[key] = {'properties': {}, 'stats': {}}
+    CONTOUR_PROPERTY_MEMO.move_to_end(key)
+    while len(CONTOUR_PROPERTY_MEMO) > MEMO_SIZE:
+        CONTOUR_PROPERTY_MEMO.popitem(last=False)
+    return entry
+
+
+def propertyFieldsUnchanged(vecLD, fields):
+    """
+    Returns True if vecLD still holds the recorded field objects.
+    """
+    return all(name in vecLD and vecLD[name] is value for name, value in fields.items())
+
+
+def contourFingerprint(vecLD):
+    """
+    Returns a hash of the contours of a line drawing, their number and the image size.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    numContours = int(np.asarray(vecLD['numContours']).ravel()[0])
+    digest.update(repr((numContours, np.asarray(vecLD.get('imsize', ())).ravel().tolist())).encode())
+    for contour in vecLD['contours'][0][:numContours]:
+        contour = np.ascontiguousarray(contour)
+        digest.update(repr((contour.shape, contour.dtype.str)).encode())
+        digest.update(contour.tobytes())
+    return digest.hexdigest()
+
+
+def propertyFields(vecLD):
+    """
+    Returns the fields of vecLD that contour histograms are computed from.
+    """
+    return {field: vecLD[field] for _, _, fields in CONTOUR_PROPERTIES.values()
+            for field in fields if field in vecLD}
+
+
+def getCachedContourStats(vecLD, name, args):
+    """
+    Returns the result that a get*Stats function stored with storeContourStats for the same
+    arguments, the current contours of vecLD and the same property fields, or None. On a hit,
+    the histogram fields that were stored with the result are put back into vecLD, in case a
+    call with other arguments has replaced them since.
+    """
+    entry = CONTOUR_PROPERTY_MEMO.get(id(vecLD))
+    stored = entry['stats'].get(name + repr(tuple(args))) if entry is not None else None
+    if stored is None or stored[0] != contourFingerprint(vecLD) or not propertyFieldsUnchanged(vecLD, stored[1]):
+        return None
+    vecLD.update(stored[3])
+    return stored[2]
+
+
+def storeContourStats(vecLD, name, args, result, fieldNames):
+    """
+    Stores the result of a get*Stats function and the fields fieldNames of vecLD that it filled
+    in, for its arguments and the current contours of vecLD.
+    """
+    fields = {field: vecLD[field] for field in fieldNames if field in vecLD}
+    getMemoEntry(vecLD)['stats'][name + repr(tuple(args))] = (contourFingerprint(vecLD), propertyFields(vecLD),
+                                                            result, fields)
+    return result
@@ -1,5 +1,6 @@
 import numpy as np
 import math
+from scipy import sparse as scipySparse
 import cv2
 from scipy import ndimage
 from skimage import io
@@ -8,10 +9,11 @@ from skimage.morphology import skeletonize
 from MLVcode.computeGradientVectorField import computeGradientVectorField
 from MLVcode.sample_sphere_2D import sample_sphere_2D
 from MLVcode.computeAOF import computeAOF
+from MLVcode.SkeletonGraph import SkeletonGraph, pruneSkeletonGraph
 
 
 
-def extract2DSkeletonFromBinaryImage(binaryImage,threshold):
+def extract2DSkeletonFromBinaryImage(binaryImage,threshold,workers=1,headless=False,diagnostics=None,sparse=False):
     """
     Extracts a 2D skeleton from a binary image.
 
@@ -23,14 +25,28 @@ def extract2DSkeletonFromBinaryImage(binaryImage,threshold):
         binaryImage (numpy.ndarray): A binary image where the objects are marked with 1's and 
         the background is marked with 0's.
         threshold (float): A threshold value used in the skeletonization process.
+        workers (int, optional): Number of worker processes used to compute the average
+        outward flux in parallel row bands. Default is 1.
+        headless (bool, optional): If True, nothing is plotted or printed, and the outer boundary
+        is computed from the image instead of being loaded from 'outerBoundaryOriginal.mat'.
+        Default is False.
+        diagnostics (callable, optional): Called as diagnostics(name, image) with the intermediate
+        images that are otherwise plotted: the thinned contours 'thin_contours' and the thinned
+        skeleton 'thin_skeleton', as well as the distance transforms passed on by
+        computeGradientVectorField. Default is None.
+        sparse (bool, optional): If True, the average outward flux is only evaluated at the pixels
+        that can pass the threshold (see computeAOF) and fluxImage is returned as a sparse matrix.
+        The skeleton is the same as without sparse. Default is False.
 
     Returns:
         tuple: A tuple (fluxImage, skeletonImage, distImage, thin_boundary) where:
             fluxImage (numpy.ndarray): Average outward flux image computed from the distance transform.
+            It is not modified by the thresholding. A scipy.sparse.csr_matrix if sparse is True.
             skeletonImage (numpy.ndarray): A binary image of the same size as binaryImage, 
-            with 1's representing the skeleton.
+            with 1's representing the one pixel wide skeleton without spurs shorter than
+            the area threshold (see thresholdFluxImage).
             distImage (numpy.ndarray): A distance-transformed image of the same size as binaryImage.
-            thin_boundary (numpy.ndarray): A thinned version of the binary image.
+            thin_boundary (numpy.ndarray): The skeleton as a uint8 image with 255 on the skeleton.
 
     -----------------------------------------------------
     This function is part of the Mid Level Vision Toolbox:
@@ -62,41 +78,94 @@ def extract2DSkeletonFromBinaryImage(binaryImage,threshold):
     inverted_binary = ~binaryImage.astype(bool)
     skeleton = skeletonize(inverted_binary, method='lee').astype(np.uint8)
     thin_boundary = cv2.bitwise_not(skeleton)
-    print("Plotting the skeleton ...")
-    io.imshow_collection([thin_boundary], cmap='gray')
-    io.show()
-    print("Skeleton is plotted.")
+    if diagnostics is not None:
+        diagnostics('thin_contours', thin_boundary)
+    if not headless:
+        print("Plotting the skeleton ...")
+        io.imshow_collection([thin_boundary], cmap='gray')
+        io.show()
+        print("Skeleton is plotted.")
     number_of_samples = 60
     epsilon = 1
-    fraction = 0.025
-    area_threshold = max(math.floor(fraction * max(binaryImage.shape[0], binaryImage.shape[1])), 1)
-    print("Area threshold is: ", area_threshold)
-    # Computing Gradient Vector Field
-    print('Distance function and gradient vector field is being computed ...\n')
-    distImage, IDX = computeGradientVectorField(thin_boundary)
+    area_threshold = getAreaThreshold(binaryImage.shape)
+    if not headless:
+        print("Area threshold is: ", area_threshold)
+        # Computing Gradient Vector Field
+        print('Distance function and gradient vector field is being computed ...\n')
+    distImage, IDX = computeGradientVectorField(thin_boundary, returnPlanes=True,
+                                                headless=headless, diagnostics=diagnostics)
     ###############################################
     # Consider a sphere with radius 1 with some sample points on that
     sphere_points = sample_sphere_2D(number_of_samples)
     # Computing Average outward flux
     # Print "DONE"
-    print('Average outward flux is being computed ...\n')
-    fluxImage = computeAOF(distImage, IDX, sphere_points, epsilon)
-    print('Average outward flux is computed.\n')
-    # Print first 2 rows of fluxImage
-    print("Flux Image: \n", fluxImage[:2])
-    skeletonImage = fluxImage
-    skeletonImage[skeletonImage < threshold*number_of_samples] = 0
-    skeletonImage[skeletonImage >= threshold*number_of_samples] = 1
-    # Skeletonize the image
-    thin_boundary = morphology.skeletonize(skeletonImage)
-    # Convert to uint8
-    thin_boundary = thin_boundary.astype(np.uint8) * 255
+    if not headless:
+        print('Average outward flux is being computed ...\n')
+    fluxImage = computeAOF(distImage, IDX, sphere_points, epsilon, workers,
+                           sparseThreshold=threshold if sparse else None)
+    if not headless:
+        print('Average outward flux is computed.\n')
+    skeletonImage, thin_boundary = thresholdFluxImage(fluxImage, threshold, number_of_samples,
+                                                      area_threshold, distImage)
+    if diagnostics is not None:
+        diagnostics('thin_skeleton', thin_boundary)
     # PLot the skeleton
-    io.imshow_collection([thin_boundary], cmap='gray')
-    io.show()
+    if not headless:
+        io.imshow_collection([thin_boundary], cmap='gray')
+        io.show()
+    return fluxImage,skeletonImage,distImage,thin_boundary
+
+
+def getAreaThreshold(shape, fraction=0.025):
+    """
+    Computes the length in pixels below which skeleton spurs are pruned, as a fraction
+    of the larger side of the image, and at least 1.
+    """
+    return max(math.floor(fraction * max(shape[0], shape[1])), 1)
+
+
+def thresholdFluxImage(fluxImage, threshold, number_of_samples=60, area_threshold=100,
+                       distImage=None, minLengthRadiusRatio=None):
+    """
+    Computes the skeleton from an average outward flux image without modifying it.
+
+    The pixels whose flux reaches the threshold are thinned to a one pixel wide skeleton,
+    which is traced into a SkeletonGraph. Spurs of fewer than area_threshold pixels and
+    small isolated pieces are then pruned from the graph (see pruneSkeletonGraph).
+
+    Args:
+        fluxImage (numpy.ndarray or scipy.sparse.spmatrix): Average outward flux image as
+        computed by computeAOF. A sparse flux image must hold every value that can pass the threshold.
+        threshold (float): The threshold on the average outward flux.
+        number_of_samples (int, optional): The number of sample points the flux was
+        summed over. Default is 60.
+        area_threshold (int, optional): The smallest length in pixels of a spur that is kept
+        (see getAreaThreshold). Default is 100.
+        distImage (numpy.ndarray, optional): The distance map, needed for minLengthRadiusRatio.
+        Default is None.
+        minLengthRadiusRatio (float, optional): If given, spurs shorter than this many times
+        the radius at their inner end are pruned as well. Default is None.
+
+    Returns:
+        tuple: A tuple (skeletonImage, thin_boundary) where:
+            skeletonImage (numpy.ndarray): A boolean image with the pruned one pixel wide skeleton.
+            thin_boundary (numpy.ndarray): The same skeleton as a uint8 image (255).
+    """
+    if scipySparse.issparse(fluxImage):
+        coo = fluxImage.tocoo()
+        passed = coo.data >= threshold*number_of_samples
+        skeletonImage = np.zeros(coo.shape, dtype=bool)
+        skeletonImage[coo.row[passed], coo.col[passed]] = True
+    else:
+        skeletonImage = fluxImage >= threshold*number_of_samples
+    # Skeletonize the image
+    skeletonImage = morphology.skeletonize(skeletonImage)
     # Refine the skeleton
-    # Convrt to bool
-    skeletonImage = (skeletonImage > 0).astype(bool)
-    area_threshold = 100  # Adjust this value according to your needs (NEED TO FIX THIS)
-    skeletonImage = morphology.remove_small_objects(skeletonImage, min_size=area_threshold) 
-    return fluxImage,skeletonImage,distImage,thin_boundary
\ No newline at end of file
+    if distImage is None:
+        distImage = np.zeros(skeletonImage.shape)
+    graph = SkeletonGraph({'skeleton': skeletonImage, 'distance_map': distImage, 'AOF': fluxImage},
+                          isThin=True)
+    skeletonImage, _ = pruneSkeletonGraph(graph, area_threshold, minLengthRadiusRatio)
+    # Convert to uint8
+    thin_boundary = skeletonImage.astype(np.uint8) * 255
+    return skeletonImage, thin_boundary
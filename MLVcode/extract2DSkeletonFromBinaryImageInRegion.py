@@ -0,0 +1,151 @@
+import math
+import numpy as np
+from scipy import sparse
+from MLVcode.sample_sphere_2D import sample_sphere_2D
+from MLVcode.extract2DSkeletonFromBinaryImage import thresholdFluxImage, getAreaThreshold
+from MLVcode.extract2DSkeletonFromBinaryImageTiled import computeTileDistanceAndFlux
+
+
+def extract2DSkeletonFromBinaryImageInRegion(binaryImage, threshold, previousMAT, dirtyRegion,
+                                             maxRadius=100, workers=1):
+    """
+    Updates the skeleton of a binary image after the image has changed within a small region.
+
+    previousMAT holds the MAT of the image before the change, and dirtyRegion is a box that
+    contains all pixels that changed. The distance map and the flux can only change within
+    maxRadius of the changed pixels (plus the one-pixel radius of the flux samples). They are
+    recomputed in this neighbourhood only, from a window of the image that is extended by
+    another maxRadius, as for a tile of extract2DSkeletonFromBinaryImageTiled. The skeleton
+    is then recomputed where the flux changed, extended by the length of the spurs that the
+    pruning can remove, from a window that is extended by that length once more. Outside these
+    neighbourhoods, the outputs are copied from previousMAT.
+
+    Args:
+        binaryImage (numpy.ndarray): The changed binary image, where the objects are marked
+        with 1's and the background is marked with 0's.
+        threshold (float): A threshold value used in the skeletonization process.
+        previousMAT (dict): The MAT of the image before the change, with the fields 'AOF',
+        'skeleton' and 'distance_map' as returned by computeMAT. It is not modified.
+        dirtyRegion (tuple): The box (r0, r1, c0, c1) around the changed pixels, i.e. the rows
+        r0:r1 and the columns c0:c1 (see getDirtyRegion). None if no pixel changed.
+        maxRadius (float, optional): The largest distance from the contours, in pixels, for
+        which the distance map and the flux have to be exact. Default is 100.
+        workers (int, optional): Number of worker processes used to compute the average
+        outward flux. Default is 1.
+
+    Returns:
+        tuple: A tuple (fluxImage, skeletonImage, distImage, thin_boundary) where:
+            fluxImage (numpy.ndarray): Average outward flux image computed from the distance transform.
+            skeletonImage (numpy.ndarray): A binary image of the same size as binaryImage,
+            with 1's representing the skeleton.
+            distImage (numpy.ndarray): A distance-transformed image of the same size as binaryImage.
+            thin_boundary (numpy.ndarray): The skeleton as a uint8 image with 255 on the skeleton.
+
+    Raises:
+        ValueError: If previousMAT does not have the size of binaryImage.
+
+    Notes:
+    - The outer boundary is computed from the image, as in headless mode, and no plots are shown.
+    - Distances larger than maxRadius, and the flux and skeleton at these distances, may differ
+      from a full recomputation, as in extract2DSkeletonFromBinaryImageTiled. The neighbourhood of a change gets an infinite
+      distance and zero flux if no contour pixel is left near it.
+
+    -----------------------------------------------------
+    This function is part of the Mid Level Vision Toolbox:
+    http://www.mlvtoolbox.org
+
+    Python Implementation: Aravind Narayanan
+    Original MATLAB Implementation: Dirk Bernhardt-Walther
+    Copyright: Dirk Bernhardt-Walther
+    University of Toronto, Toronto, Ontario, Canada, 2024
+
+    Contact: dirk.walther@gmail.com
+    -----------------------------------------------------
+    """
+    shape = binaryImage.shape
+    if np.shape(previousMAT['distance_map']) != shape:
+        raise ValueError('previousMAT has the size %s, but the image has the size %s'
+                         % (np.shape(previousMAT['distance_map']), shape))
+    number_of_samples = 60
+    epsilon = 1
+    area_threshold = getAreaThreshold(shape)
+
+    # Copies, so that previousMAT (which may be memory-mapped from the cache) is left untouched
+    fluxImage = previousMAT['AOF']
+    fluxImage = fluxImage.toarray() if sparse.issparse(fluxImage) else np.array(fluxImage, dtype=np.float64)
+    distImage = np.array(previousMAT['distance_map'], dtype=np.float64)
+    skeletonImage = np.array(previousMAT['skeleton'], dtype=bool)
+
+    if dirtyRegion is not None:
+        dirtyRegion = growRegion(dirtyRegion, 0, shape)
+    if dirtyRegion is not None and dirtyRegion[0] < dirtyRegion[1] and dirtyRegion[2] < dirtyRegion[3]:
+        # The distance map changes within maxRadius of the changed pixels (and the outer boundary
+        # one pixel further), the flux one more pixel further out
+        radius = int(math.ceil(maxRadius))
+        fluxRegion = growRegion(dirtyRegion, radius + 3, shape)
+        window = growRegion(fluxRegion, radius + 2, shape)
+        windowDist, windowFlux = computeTileDistanceAndFlux(
+            binaryImage, window, sample_sphere_2D(number_of_samples), epsilon, workers)
+        core = regionInWindow(fluxRegion, window)
+        target = regionSlices(fluxRegion)
+        if windowDist is None:
+            fluxImage[target] = 0
+            distImage[target] = np.inf
+        else:
+            fluxImage[target] = windowFlux[core]
+            distImage[target] = windowDist[core]
+
+        # Spurs of fewer than area_threshold pixels that touch the changed flux may be pruned
+        # or kept differently. Branches cut by the window edge are longer than that.
+        skeletonRegion = growRegion(fluxRegion, area_threshold + 2, shape)
+        window = growRegion(skeletonRegion, area_threshold + 2, shape)
+        windowSkeleton, _ = thresholdFluxImage(fluxImage[regionSlices(window)], threshold,
+                                               number_of_samples, area_threshold,
+                                               distImage[regionSlices(window)])
+        skeletonImage[regionSlices(skeletonRegion)] = windowSkeleton[regionInWindow(skeletonRegion, window)]
+
+    thin_boundary = skeletonImage.astype(np.uint8) * 255
+    return fluxImage, skeletonImage, distImage, thin_boundary
+
+
+def getDirtyRegion(previousImage, image):
+    """
+    Returns the box (r0, r1, c0, c1) around all pixels that differ between two images of the
+    same size, or None if the images are equal.
+    """
+    previousImage = np.asarray(previousImage)
+    image = np.asarray(image)
+    if previousImage.shape != image.shape:
+        raise ValueError('The images differ in size')
+    changed = previousImage != image
+    if changed.ndim == 3:
+        changed = changed.any(axis=2)
+    rows = np.flatnonzero(changed.any(axis=1))
+    if len(rows) == 0:
+        return None
+    cols = np.flatnonzero(changed.any(axis=0))
+    return int(rows[0]), int(rows[-1]) + 1, int(cols[0]), int(cols[-1]) + 1
+
+
+def growRegion(region, margin, shape):
+    """
+    Extends the box (r0, r1, c0, c1) by margin pixels on every side, clipped to the image shape.
+    """
+    r0, r1, c0, c1 = region
+    return (max(int(r0) - margin, 0), min(int(r1) + margin, shape[0]),
+            max(int(c0) - margin, 0), min(int(c1) + margin, shape[1]))
+
+
+def regionSlices(region):
+    """
+    Returns the box (r0, r1, c0, c1) as a pair of slices.
+    """
+    return slice(region[0], region[1]), slice(region[2], region[3])
+
+
+def regionInWindow(region, window):
+    """
+    Returns the slices of the box region within the box window that contains it.
+    """
+    return (slice(region[0] - window[0], region[1] - window[0]),
+            slice(region[2] - window[2], region[3] - window[2]))
@@ -0,0 +1,187 @@
+import os
+import math
+import numpy as np
+import cv2
+from skimage.morphology import skeletonize
+from MLVcode.computeGradientVectorField import computeGradientVectorField
+from MLVcode.getOuterBoundary import getOuterBoundary
+from MLVcode.sample_sphere_2D import sample_sphere_2D
+from MLVcode.computeAOF import computeAOF
+from MLVcode.extract2DSkeletonFromBinaryImage import thresholdFluxImage, getAreaThreshold
+
+# Estimated peak working memory per tile pixel, in bytes: the tile and its thinned
+# copies, the two distance transforms with their index planes, D, IDX, the flux image
+# and the per-sample temporaries of computeAOF. This is a rough count of these arrays,
+# not a measurement.
+BYTES_PER_TILE_PIXEL = 200
+# Additional memory per tile pixel when computeAOF copies D, IDX and the flux image
+# into shared memory for its worker processes.
+BYTES_PER_SHARED_TILE_PIXEL = 24
+# The smallest ratio of the core of a tile to its overlap. Below it, most of the work
+# would be spent on the overlaps.
+MIN_CORE_OVERLAP_RATIO = 1
+
+
+def extract2DSkeletonFromBinaryImageTiled(binaryImage, threshold, memoryBudget, maxRadius=100,
+                                          workers=1, outputDir=None):
+    """
+    Extracts a 2D skeleton from a binary image in overlapping tiles with bounded memory.
+
+    This function produces the same outputs as extract2DSkeletonFromBinaryImage, but never
+    holds the intermediate images (distance transforms, index maps, flux) for more than one
+    tile at a time. The image is cut into tiles whose size is chosen such that the working
+    memory of one tile stays within memoryBudget. Every tile is extended by an overlap that
+    is large enough for the distance transform to be exact for all distances up to maxRadius,
+    for the flux to see its one-sample-radius neighbourhood, and for the removal of small
+    skeleton fragments to see these fragments in full. Only the core of each tile is
+    written back into the stitched outputs.
+
+    Args:
+        binaryImage (numpy.ndarray): A binary image where the objects are marked with 1's and
+        the background is marked with 0's. May be a memory-mapped array.
+        threshold (float): A threshold value used in the skeletonization process.
+        memoryBudget (int): The approximate working memory budget for one tile, in bytes
+        (see BYTES_PER_TILE_PIXEL).
+        maxRadius (float, optional): The largest distance from the contours, in pixels, for
+        which the distance map and the flux have to be exact. Default is 100.
+        workers (int, optional): Number of worker processes used to compute the average
+        outward flux of each tile. Default is 1.
+        outputDir (str, optional): If given, the outputs are created as memory-mapped .npy
+        files in this directory ('AOF.npy', 'skeleton.npy', 'distance_map.npy' and
+        'thin_boundary.npy') instead of in memory. Default is None.
+
+    Returns:
+        tuple: A tuple (fluxImage, skeletonImage, distImage, thin_boundary) where:
+            fluxImage (numpy.ndarray): Average outward flux image computed from the distance transform.
+            skeletonImage (numpy.ndarray): A binary image of the same size as binaryImage,
+            with 1's representing the skeleton.
+            distImage (numpy.ndarray): A distance-transformed image of the same size as binaryImage.
+            thin_boundary (numpy.ndarray): A thinned version of the skeleton image.
+
+    Raises:
+        ValueError: If memoryBudget is too small for tiles whose core is at least
+        MIN_CORE_OVERLAP_RATIO times as wide as the required overlap, and too small for the
+        whole image. The message gives the smallest budget for such tiles.
+
+    Notes:
+    - The outer boundary of each tile is computed in place instead of being loaded from
+      'outerBoundaryOriginal.mat', and no plots are shown.
+    - Distances larger than maxRadius may differ from the untiled result. Tiles without any
+      contour pixel get an infinite distance and zero flux.
+    - memoryBudget does not include the stitched outputs. Use outputDir to keep them on disk.
+    - The tile size is derived from an estimate of the memory per tile pixel, so the actual
+      peak memory of a tile may be somewhat above or below memoryBudget.
+
+    -----------------------------------------------------
+    This function is part of the Mid Level Vision Toolbox:
+    http://www.mlvtoolbox.org
+
+    Python Implementation: Aravind Narayanan
+    Original MATLAB Implementation: Dirk Bernhardt-Walther
+    Copyright: Dirk Bernhardt-Walther
+    University of Toronto, Toronto, Ontario, Canada, 2024
+
+    Contact: dirk.walther@gmail.com
+    -----------------------------------------------------
+    """
+    m, n = binaryImage.shape
+    number_of_samples = 60
+    epsilon = 1
+    area_threshold = getAreaThreshold((m, n))
+    sphere_points = sample_sphere_2D(number_of_samples)
+
+    # The distance transform needs maxRadius, the flux one more pixel on either side,
+    # and the pruning has to see complete spurs of fewer than area_threshold pixels
+    # next to the core.
+    overlap = int(math.ceil(maxRadius)) + 2 + area_threshold
+    bytesPerPixel = BYTES_PER_TILE_PIXEL
+    if workers > 1:
+        bytesPerPixel += BYTES_PER_SHARED_TILE_PIXEL
+    tileSize = math.isqrt(int(memoryBudget // bytesPerPixel)) - 2 * overlap
+    if m * n * bytesPerPixel <= memoryBudget:
+        # The whole image fits into one tile
+        tileSize = max(tileSize, m, n)
+    # A smaller core is fine if it covers the whole image
+    minTileSize = min(int(math.ceil(MIN_CORE_OVERLAP_RATIO * overlap)), max(m, n))
+    if tileSize < max(minTileSize, 1):
+        minBudget = (max(minTileSize, 1) + 2 * overlap)**2 * bytesPerPixel
+        raise ValueError('memoryBudget of %d bytes is too small for tiles with an overlap of %d pixels '
+                         'and a core of at least %d pixels; it needs to be at least %d bytes'
+                         % (memoryBudget, overlap, max(minTileSize, 1), minBudget))
+
+    fluxImage = allocateOutput(outputDir, 'AOF', (m, n), np.float64)
+    skeletonImage = allocateOutput(outputDir, 'skeleton', (m, n), bool)
+    distImage = allocateOutput(outputDir, 'distance_map', (m, n), np.float64)
+    thin_boundary = allocateOutput(outputDir, 'thin_boundary', (m, n), np.uint8)
+
+    for r0 in range(0, m, tileSize):
+        for c0 in range(0, n, tileSize):
+            r1 = min(r0 + tileSize, m)
+            c1 = min(c0 + tileSize, n)
+            R0 = max(r0 - overlap, 0)
+            C0 = max(c0 - overlap, 0)
+            R1 = min(r1 + overlap, m)
+            C1 = min(c1 + overlap, n)
+            core = (slice(r0 - R0, r1 - R0), slice(c0 - C0, c1 - C0))
+
+            tileDist, tileFlux = computeTileDistanceAndFlux(binaryImage, (R0, R1, C0, C1),
+                                                            sphere_points, epsilon, workers)
+            if tileDist is None:
+                fluxImage[r0:r1, c0:c1] = 0
+                skeletonImage[r0:r1, c0:c1] = False
+                distImage[r0:r1, c0:c1] = np.inf
+                thin_boundary[r0:r1, c0:c1] = 0
+                continue
+
+            # Branches cut by an inner tile edge reach through the overlap and are therefore
+            # longer than area_threshold, so they are never pruned as spurs.
+            tileSkeleton, tileThin = thresholdFluxImage(tileFlux, threshold, number_of_samples,
+                                                        area_threshold, tileDist)
+
+            fluxImage[r0:r1, c0:c1] = tileFlux[core]
+            skeletonImage[r0:r1, c0:c1] = tileSkeleton[core]
+            distImage[r0:r1, c0:c1] = tileDist[core]
+            thin_boundary[r0:r1, c0:c1] = tileThin[core]
+
+    return fluxImage, skeletonImage, distImage, thin_boundary
+
+
+def computeTileDistanceAndFlux(binaryImage, tile, sphere_points, epsilon, workers=1):
+    """
+    Computes the distance map and the average outward flux of one tile of a binary image.
+
+    The tile is given as (R0, R1, C0, C1), the rows R0:R1 and columns C0:C1 of binaryImage.
+    Both outputs are exact away from the tile edges (see extract2DSkeletonFromBinaryImageTiled).
+
+    Returns:
+        tuple: A tuple (tileDist, tileFlux) with the distance map and the flux of the tile, or
+        (None, None) if the tile contains no contour pixel.
+    """
+    R0, R1, C0, C1 = tile
+    tileImage = np.asarray(binaryImage[R0:R1, C0:C1])
+    skeleton = skeletonize(~tileImage.astype(bool), method='lee').astype(np.uint8)
+    if not np.any(skeleton):
+        return None, None
+    tileBoundary = cv2.bitwise_not(skeleton)
+    outerBoundary, _ = getOuterBoundary((tileBoundary == 255).astype(np.uint8), 0)
+    tileDist, (tileRows, tileCols) = computeGradientVectorField(
+        tileBoundary, outerBoundary, showPlots=False, returnPlanes=True)
+    # Contour pixels off the outer boundary carry index 0, i.e. the first pixel of the
+    # whole image rather than of the tile, which lies at (-R0, -C0) in tile coordinates.
+    imageOrigin = (tileRows == 0) & (tileCols == 0) & (tileDist == 0)
+    tileRows[imageOrigin] = -R0
+    tileCols[imageOrigin] = -C0
+    tileFlux = computeAOF(tileDist, (tileRows, tileCols), sphere_points, epsilon, workers)
+    return tileDist, tileFlux
+
+
+def allocateOutput(outputDir, name, shape, dtype):
+    """
+    Allocates a zero-initialised output image, either in memory or as a memory-mapped
+    .npy file named after the output in outputDir.
+    """
+    if outputDir is None:
+        return np.zeros(shape, dtype=dtype)
+    return np.lib.format.open_memmap(os.path.join(outputDir, name + '.npy'),
+                                     mode='w+', dtype=dtype, shape=shape)
+
@@ -1,6 +1,6 @@
 import numpy as np
-from smoothData import smoothData # Need to add
-from diff import diff # Need to add
+from MLVcode.smoothData import smoothData
+from MLVcode.diff import diff
 
 
 def getBranchDerivative(branch):
@@ -14,7 +14,7 @@ def getBranchDerivative(branch):
 
     Args:
         branch (dict): A dictionary containing the following keys:
-            - 'Radius' (list or ndarray): The radius values along the branch.
+            - 'R' (list or ndarray): The radius values along the branch.
             - 'X' (list or ndarray): The x-coordinates of points along the branch.
             - 'Y' (list or ndarray): The y-coordinates of points along the branch.
 
@@ -29,12 +29,12 @@ def getBranchDerivative(branch):
     - The radius values are smoothed using a moving mean filter with a window size of 3.
     - The `diff` function is used to calculate the differences between consecutive values in the radius, 
       x, and y arrays.
-    - For the x and y derivatives, the final value is duplicated to maintain the same length as the input arrays.
+    - For all derivatives, the final value is duplicated to maintain the same length as the input arrays.
     - If the radius array contains only a single value, the derivatives are set to zero.
 
     Raises:
-        KeyError: If the input dictionary does not contain the keys 'Radius', 'X', or 'Y'.
-        TypeError: If the values associated with 'Radius', 'X', or 'Y' are not lists or ndarrays.
+        KeyError: If the input dictionary does not contain the keys 'R', 'X', or 'Y'.
+        TypeError: If the values associated with 'R', 'X', or 'Y' are not lists or ndarrays.
         
     -----------------------------------------------------
     This function is part of the Mid Level Vision Toolbox:
@@ -48,7 +48,7 @@ def getBranchDerivative(branch):
     Contact: dirk.walther@gmail.com
     -----------------------------------------------------
     """
-    R = branch['Radius']
+    R = branch['R']
     R = smoothData(R, 'movemean', 3)
 
     if len(R)>1:
@@ -58,8 +58,9 @@ def getBranchDerivative(branch):
         dY = diff(Y)
         dR = diff(R)
         
-        dX = np.concatenate((dX, [dX[-1]])) # Check
-        dY = np.concatenate((dY, [dY[-1]])) # Check
+        dX = np.concatenate((dX, [dX[-1]]))
+        dY = np.concatenate((dY, [dY[-1]]))
+        dR = np.concatenate((dR, [dR[-1]]))
 
     else:
         dX = 0
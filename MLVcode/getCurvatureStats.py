@@ -1,5 +1,5 @@
 import numpy as np
-from MLVcode.computeCurvature import computeCurvature
+from MLVcode.ensureContourProperties import ensureContourProperties, getCachedContourStats, storeContourStats
 
 
 def getCurvatureStats(vecLD,
@@ -33,8 +33,10 @@ def getCurvatureStats(vecLD,
     Contact: dirk.walther@gmail.com
     -----------------------------------------------------
     """
-    if 'curvatures' not in vecLD:
-        vecLD = computeCurvature(vecLD)
+    cached = getCachedContourStats(vecLD, 'curvatureStats', (numBins, minmaxCurvature))
+    if cached is not None:
+        return (vecLD,) + cached
+    vecLD = ensureContourProperties(vecLD, ['curvature'])
         
     logMinMax = np.log10(np.array(minmaxCurvature)+1)
     binWidth = (logMinMax[1]-logMinMax[0])/numBins # the range of the original length is from max to min length value
@@ -63,5 +65,8 @@ def getCurvatureStats(vecLD,
     curvatureHistogram = vecLD['sumCurvatureHistogram']
     vecLD['curvatureBins'] = bins
     shortName = 'curv'
+    storeContourStats(vecLD, 'curvatureStats', (numBins, minmaxCurvature), (curvatureHistogram, bins, shortName),
+                      ['curvatureHistograms', 'normCurvatureHistograms', 'sumCurvatureHistogram',
+                       'normSumCurvatureHistogram', 'curvatureBins'])
 
     return vecLD,curvatureHistogram,bins,shortName
\ No newline at end of file
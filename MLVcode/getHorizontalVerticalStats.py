@@ -1,6 +1,5 @@
 import numpy as np
-from MLVcode.computeOrientation import computeOrientation
-from MLVcode.computeLength import computeLength
+from MLVcode.ensureContourProperties import ensureContourProperties, getCachedContourStats, storeContourStats
 
 def getHorizontalVerticalStats(vecLD,numBins=8):
     """
@@ -31,10 +30,10 @@ def getHorizontalVerticalStats(vecLD,numBins=8):
     Contact: dirk.walther@gmail.com
     -----------------------------------------------------
     """
-    if not hasattr(vecLD, 'orientations'):
-        vecLD = computeOrientation(vecLD)
-    if not hasattr(vecLD, 'lengths'):
-        vecLD = computeLength(vecLD)
+    cached = getCachedContourStats(vecLD, 'horizontalVerticalStats', (numBins,))
+    if cached is not None:
+        return (vecLD,) + cached
+    vecLD = ensureContourProperties(vecLD, ['orientation', 'length'])
     
     bwidth = 2/numBins
     binEdges = np.arange(-1+bwidth, 1, bwidth)
@@ -59,6 +58,8 @@ def getHorizontalVerticalStats(vecLD,numBins=8):
     HorVerHistogram = vecLD['sumHorVerHistogram']
     vecLD['HorVerBins'] = bins
     shortName = 'horver'
+    storeContourStats(vecLD, 'horizontalVerticalStats', (numBins,), (HorVerHistogram, bins, shortName),
+                      ['HorVerHistogram', 'sumHorVerHistogram', 'HorVerBins'])
 
     
     return vecLD,HorVerHistogram,bins,shortName
\ No newline at end of file
@@ -1,5 +1,5 @@
 import numpy as np
-from MLVcode.computeJunctions import computeJunctions
+from MLVcode.ensureContourProperties import ensureContourProperties, getCachedContourStats, storeContourStats
 
 
 def getJunctionStats(vecLD,
@@ -35,8 +35,10 @@ def getJunctionStats(vecLD,
     -----------------------------------------------------
     """
     # Need to fix the junction angles
-    if 'junctions' not in vecLD:
-        vecLD = computeJunctions(vecLD)
+    cached = getCachedContourStats(vecLD, 'junctionStats', (numAngleBins, junctionTypes))
+    if cached is not None:
+        return (vecLD,) + cached
+    vecLD = ensureContourProperties(vecLD, ['junctions'])
 
     if len(vecLD['junctions']) == 0:
         vecLD['junctionContourHistograms'] = np.zeros((vecLD['numContours'][0][0],
@@ -98,5 +100,9 @@ def getJunctionStats(vecLD,
 
     bins = [junctionTypes, angleBins]
     shortNames = ['juncType', 'juncAngle']
+    storeContourStats(vecLD, 'junctionStats', (numAngleBins, junctionTypes), (histograms, bins, shortNames),
+                      ['junctionContourHistograms', 'normJuctionContourHistograms', 'normJunctionContourHistograms',
+                       'junctionTypeHistogram', 'normJunctionTypeHistogram', 'junctionTypeBins',
+                       'junctionAngleHistogram', 'normJunctionAngleHistogram', 'junctionAngleBins'])
 
     return vecLD, histograms, bins, shortNames
\ No newline at end of file
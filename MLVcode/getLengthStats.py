@@ -1,5 +1,5 @@
 import numpy as np
-from MLVcode.computeLength import computeLength
+from MLVcode.ensureContourProperties import ensureContourProperties, getCachedContourStats, storeContourStats
 
 
 def getLengthStats(vecLD,
@@ -39,8 +39,10 @@ def getLengthStats(vecLD,
     Contact: dirk.walther@gmail.com
     -----------------------------------------------------
     """
-    if 'lengths' not in vecLD:
-        vecLD = computeLength(vecLD)
+    cached = getCachedContourStats(vecLD, 'lengthStats', (numBins, minmaxLength))
+    if cached is not None:
+        return (vecLD,) + cached
+    vecLD = ensureContourProperties(vecLD, ['length'])
 
     if minmaxLength is None:
         minmaxLength = [2, np.sum(vecLD['imsize'])]
@@ -69,4 +71,7 @@ def getLengthStats(vecLD,
     lengthHistogram = vecLD['sumLengthHistogram']
     vecLD['lengthBins'] = bins
     shortName = 'len'
+    storeContourStats(vecLD, 'lengthStats', (numBins, minmaxLength), (lengthHistogram, bins, shortName),
+                      ['lengthHistogram', 'normLengthHistogram', 'sumLengthHistogram',
+                       'normSumLengthHistogram', 'lengthBins'])
     return vecLD,lengthHistogram,bins,shortName
\ No newline at end of file
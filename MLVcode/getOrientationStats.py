@@ -1,7 +1,6 @@
 import numpy as np
 import matplotlib.pyplot as plt
-from MLVcode.computeOrientation import computeOrientation
-from MLVcode.computeLength import computeLength
+from MLVcode.ensureContourProperties import ensureContourProperties, getCachedContourStats, storeContourStats
 
 def getOrientationStats(vecLD, numBins=8):
     """
@@ -34,11 +33,10 @@ def getOrientationStats(vecLD, numBins=8):
     Contact: dirk.walther@gmail.com
     -----------------------------------------------------
     """
-    # Check if vecLD's orientation key exists
-    if 'orientations' not in vecLD:
-        vecLD = computeOrientation(vecLD)
-    if 'lengths' not in vecLD:
-        vecLD = computeLength(vecLD)
+    cached = getCachedContourStats(vecLD, 'orientationStats', (numBins,))
+    if cached is not None:
+        return (vecLD,) + cached
+    vecLD = ensureContourProperties(vecLD, ['orientation', 'length'])
 
 
     bwidth = 180/numBins
@@ -71,4 +69,7 @@ def getOrientationStats(vecLD, numBins=8):
     oriHistogram = vecLD['sumOrientationHistogram']
     vecLD['orientationBins'] = bins
     shortName = 'ori'
+    storeContourStats(vecLD, 'orientationStats', (numBins,), (oriHistogram, bins, shortName),
+                      ['orientationHistograms', 'normOrientstionHistograms', 'sumOrientationHistogram',
+                       'normSumOrientationHistogram', 'orientationBins'])
     return vecLD, oriHistogram, bins, shortName
\ No newline at end of file
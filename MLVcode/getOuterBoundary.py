@@ -1,15 +1,16 @@
 import numpy as np
-from scipy.ndimage import distance_transform_edt
-from MLVcode.is_outer_border_point import is_outer_border_point
+from scipy import ndimage
 
 
 def getOuterBoundary(binaryImage, background):
     """
     Extracts the outer boundary coordinates from a binary image.
 
-    This function traverses a binary image and identifies the outer boundary points 
-    using an 8-neighborhood approach. It checks if each pixel is an outer border point 
-    relative to the specified background value.
+    This function identifies the outer boundary points of a binary image using an 
+    8-neighborhood approach. A pixel is an outer border point if it equals the specified 
+    background value and its 8-neighborhood contains both pixels above and pixels at or 
+    below the background value (see is_outer_border_point). All pixels are tested at once 
+    by dilating the two neighbor classes over the image.
 
     Args:
         binaryImage (numpy.ndarray): A binary image where the objects are marked 
@@ -19,9 +20,9 @@ def getOuterBoundary(binaryImage, background):
 
     Returns:
         tuple: A tuple (result, result2) where:
-            result (numpy.ndarray): An array of shape (number of boundary points, 2), 
-            containing the coordinates of the boundary points.
-            result2 (numpy.ndarray): A binary image of the same size as binaryImage, 
+            result (numpy.ndarray): An int32 array of shape (number of boundary points, 2), 
+            containing the (row, column) coordinates of the boundary points in row-major order.
+            result2 (numpy.ndarray): A uint8 binary image of the same size as binaryImage, 
             with 1's marking the boundary points and 0's elsewhere.
 
     Notes:
@@ -30,8 +31,7 @@ def getOuterBoundary(binaryImage, background):
       one background pixel in their 8-neighborhood.
     - 'result' contains the coordinates of the boundary points, while 'result2' is a binary 
       image marking these points.
-    - Debug information such as the size of 'result' and the counter of boundary points 
-      is printed during execution.
+    - Pixels on the image border are never boundary points.
 
     -----------------------------------------------------
     This function is part of the Mid Level Vision Toolbox:
@@ -45,22 +45,19 @@ def getOuterBoundary(binaryImage, background):
     Contact: dirk.walther@gmail.com
     -----------------------------------------------------
     """
-    m_Neighbors8 = np.array([[-1, -1], [-1, 0], [-1, 1],
-                             [0, -1], [0, 1],
-                             [1, -1], [1, 0], [1, 1]])
-    result2 = np.zeros(shape=binaryImage.shape)
+    binaryImage = np.asarray(binaryImage)
+    result2 = np.zeros(binaryImage.shape, dtype=np.uint8)
     m, n = binaryImage.shape
-    result = np.zeros(shape=(m * n, 2))
-    print("Result Size: ", result.shape)
-    counter = 0
-    for i in range(1, m - 1):
-        for j in range(1, n - 1):
-            if is_outer_border_point(binaryImage, i, j, m_Neighbors8, background):
-                result[counter][0] = i
-                result[counter][1] = j
-                result2[i][j] = 1
-                counter += 1
-    print("Counter: ", counter)
-    # result = result(1:counter-1,:); to python
-    result = result[:counter, :]
-    return result, result2
\ No newline at end of file
+    if m < 3 or n < 3:
+        return np.zeros((0, 2), dtype=np.int32), result2
+
+    # 8-neighborhood without the center pixel
+    neighbors8 = np.ones((3, 3), dtype=bool)
+    neighbors8[1, 1] = False
+    hasForeground = ndimage.binary_dilation(binaryImage > background, structure=neighbors8)
+    hasBackground = ndimage.binary_dilation(binaryImage <= background, structure=neighbors8)
+
+    isBorderPoint = (binaryImage == background) & hasForeground & hasBackground
+    result2[1:m - 1, 1:n - 1] = isBorderPoint[1:m - 1, 1:n - 1]
+    result = np.argwhere(result2).astype(np.int32)
+    return result, result2
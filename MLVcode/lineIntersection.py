@@ -29,6 +29,7 @@ def lineIntersection(query_line, ref_line, re = 0.3, ae = 2.0):
     - 'RE' (relative epsilon) and 'AE' (absolute epsilon) are thresholds used to determine the 
       intersection under flexible geometric constraints.
     - The function assumes line segments are defined in 2D space.
+    - lineIntersectionBatch tests many pairs of line segments at once.
 
     -----------------------------------------------------
     This function is part of the Mid Level Vision Toolbox:
@@ -90,4 +91,66 @@ def lineIntersection(query_line, ref_line, re = 0.3, ae = 2.0):
             
             return np.array([x, y])
     else:
-        return None
\ No newline at end of file
+        return None
+
+
+def lineIntersectionBatch(query_lines, ref_lines, re=0.3, ae=2.0):
+    """
+    Determines the intersection points of many pairs of line segments at once.
+
+    Pair i consists of query_lines[i] and ref_lines[i]. Every step of lineIntersection, including
+    the tolerances at and bt and the snapping to end points within eps, is carried out on all
+    pairs with the same floating point operations, so that the results equal those of
+    lineIntersection for every pair.
+
+    Args:
+        query_lines (numpy.ndarray): The (P, 4) first line segments [X1, Y1, X2, Y2].
+        ref_lines (numpy.ndarray): The (P, 4) second line segments [X1, Y1, X2, Y2].
+        re (float, optional): The relative epsilon, see lineIntersection. Default is 0.3.
+        ae (float, optional): The absolute epsilon, see lineIntersection. Default is 2 pixels.
+
+    Returns:
+        tuple: A tuple (positions, valid) where:
+            positions (numpy.ndarray): The (P, 2) intersection points [x, y], NaN where the
+            segments do not intersect.
+            valid (numpy.ndarray): A boolean array that is True for the pairs that intersect.
+    """
+    eps = 1e-4
+    q = np.asarray(query_lines, dtype=np.float64).reshape((-1, 4))
+    r = np.asarray(ref_lines, dtype=np.float64).reshape((-1, 4))
+    if len(q) != len(r):
+        raise ValueError('There are %d query lines but %d reference lines' % (len(q), len(r)))
+
+    ay = q[:, 2] - q[:, 0]
+    ax = q[:, 3] - q[:, 1]
+    by = r[:, 2] - r[:, 0]
+    bx = r[:, 3] - r[:, 1]
+    cy = r[:, 0] - q[:, 0]
+    cx = r[:, 1] - q[:, 1]
+
+    d = ay * bx - ax * by
+    # Lines are parallel or coincident where d == 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        a = (bx * cy - by * cx) / d
+        b = (ax * cy - ay * cx) / d
+        at = np.minimum(re, ae / np.maximum(np.abs(ax), np.abs(ay)))
+        bt = np.minimum(re, ae / np.maximum(np.abs(bx), np.abs(by)))
+    valid = (d != 0) & (-at <= a) & (a <= 1 + at) & (-bt <= b) & (b <= 1 + bt)
+
+    # General case for calculating the intersection
+    a1 = q[:, 1] - q[:, 3]
+    b1 = q[:, 2] - q[:, 0]
+    c1 = q[:, 0] * q[:, 3] - q[:, 1] * q[:, 2]
+    a2 = r[:, 1] - r[:, 3]
+    b2 = r[:, 2] - r[:, 0]
+    c2 = r[:, 0] * r[:, 3] - r[:, 1] * r[:, 2]
+    dd = a1 * b2 - a2 * b1
+    with np.errstate(divide='ignore', invalid='ignore'):
+        general = np.stack(((b1 * c2 - b2 * c1) / dd, (a2 * c1 - a1 * c2) / dd), axis=1)
+
+    # Special cases where a or b are 0 or 1, in the order of lineIntersection
+    cases = [np.abs(a) < eps, np.abs(a - 1) < eps, np.abs(b) < eps, np.abs(b - 1) < eps]
+    points = [q[:, :2], q[:, 2:], r[:, :2], r[:, 2:]]
+    positions = np.select([case[:, None] for case in cases], points, general)
+    positions[~valid] = np.nan
+    return positions, valid
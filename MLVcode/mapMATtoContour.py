@@ -1,113 +1,94 @@
 import numpy as np
 from scipy.spatial import cKDTree
+from MLVcode.SkeletonGraph import SkeletonGraph
 
+# Contour pixels within this distance of a tangent point receive its score
+neigh_radius = 4
+# Contour pixels queried against the KD-tree at once, which bounds the memory of the query
+QUERY_CHUNK = 4096
 
 
 def getIntersectionTangents(x1, y1, r1, x2, y2, r2):
+    """
+    Computes the points where the outer tangents of two circles touch the circles, for arrays
+    of circle pairs. Where both centers coincide, all four points are the center.
+    """
+    x1, y1, r1, x2, y2, r2 = np.broadcast_arrays(*[np.asarray(a, dtype=float) for a in (x1, y1, r1, x2, y2, r2)])
     d = np.sqrt((x2-x1)**2 + (y2-y1)**2)
-    if d==0:
-        FX1 = x1
-        FY1 = y1
-        FX2 = x1
-        FY2 = y1
-    else:
-        r1MinusR2 = r2 - r1
-        cosAlpha = r1MinusR2/d
-        if abs(cosAlpha) > 1:
-            cosAlpha = cosAlpha/abs(cosAlpha)+0.00001
+    same = d == 0
+    d = np.where(same, 1, d)
+
+    r1MinusR2 = r2 - r1
+    cosAlpha = r1MinusR2/d
+    tooFar = np.abs(cosAlpha) > 1
+    cosAlpha = np.where(tooFar, np.sign(cosAlpha)+0.00001, cosAlpha)
+    with np.errstate(invalid='ignore'):
         sinAlpha = np.sqrt(1-cosAlpha**2)
-        FX1 = []
-        FY1 = []
-        FX2 = []
-        FY2 = []
-
-        alpha = 0.5
-        beta = 1 - alpha
-        mx = alpha*x1 + beta*x2
-        my = alpha*y1 + beta*y2
-        mr = alpha*r1 + beta*r2
-
-        vx = x1 - mx
-        vy = y1 - my
-
-        fvx1 = cosAlpha*vx + sinAlpha*vy
-        fvy1 = -sinAlpha*vx + cosAlpha*vy
-
-        fvx2 = cosAlpha*vx - sinAlpha*vy
-        fvy2 = sinAlpha*vx + cosAlpha*vy
-
-        nv1 = np.sqrt(fvx1**2 + fvy1**2)
-        s1 = mr/nv1
-        fvx1 = fvx1*s1
-        fvy1 = fvy1*s1
-
-        nv2 = np.sqrt(fvx2**2 + fvy2**2)
-        s2 = mr/nv2
-        fvx2 = fvx2*s2
-        fvy2 = fvy2*s2
-
-        fx1 = mx + fvx1
-        fy1 = my + fvy1
-
-        fx2 = mx + fvx2
-        fy2 = my + fvy2
-
-        nFX1 = np.vstack((FX1, fx1))
-        nFY1 = np.vstack((FY1, fy1))
-        nFX2 = np.vstack((FX2, fx2))
-        nFY2 = np.vstack((FY2, fy2))
-        FX1 = nFX1
-        FY1 = nFY1
-        FX2 = nFX2
-        FY2 = nFY2
 
+    alpha = 0.5
+    beta = 1 - alpha
+    mx = alpha*x1 + beta*x2
+    my = alpha*y1 + beta*y2
+    mr = alpha*r1 + beta*r2
+
+    vx = x1 - mx
+    vy = y1 - my
+
+    fvx1 = cosAlpha*vx + sinAlpha*vy
+    fvy1 = -sinAlpha*vx + cosAlpha*vy
+
+    fvx2 = cosAlpha*vx - sinAlpha*vy
+    fvy2 = sinAlpha*vx + cosAlpha*vy
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        s1 = mr/np.sqrt(fvx1**2 + fvy1**2)
+        s2 = mr/np.sqrt(fvx2**2 + fvy2**2)
+
+    FX1 = np.where(same, x1, mx + fvx1*s1)
+    FY1 = np.where(same, y1, my + fvy1*s1)
+    FX2 = np.where(same, x1, mx + fvx2*s2)
+    FY2 = np.where(same, y1, my + fvy2*s2)
     return FX1, FY1, FX2, FY2
 
-def getTangentPointsContour(contour, imsize):
-    R = contour['Radius']
-    X = contour['X']
-    Y = contour['Y']
-    SKInds = []
-    if len(X)>=1:
-        FX1 = []
-        FX2 = []
-        FY1 = []
-        FY2 = []
-
-        for i in range(len(X)-1):
-            x1 = X[i]
-            y1 = Y[i]
-            x2 = X[i+1]
-            y2 = Y[i+1]
-            rv1 = R[i]
-            rv2 = R[i+1]
-
-            r1Range = [rv1-0.1, rv1, rv1+0.1]
-            r2Range = [rv2-0.1, rv2, rv2+0.1]
-            for r1 in r1Range:
-                for r2 in r2Range:
-                    fx1, fy1, fx2, fy2 = getIntersectionTangents(x1, y1, r1, x2, y2, r2)
-                    skIndex = np.ravel_multi_index((x1, y1), imsize)
-
-                    nFX1 = np.vstack((FX1, fx1))
-                    nFY1 = np.vstack((FY1, fy1))
-                    nFX2 = np.vstack((FX2, fx2))
-                    nFY2 = np.vstack((FY2, fy2))
-                    FX1 = nFX1
-                    FY1 = nFY1
-                    FX2 = nFX2
-                    FY2 = nFY2
-                    nSKInds = np.vstack((SKInds, skIndex))
-                    SKInds = nSKInds
-
-        FP1 = np.column_stack((FX1, FY1))
-        FP2 = np.column_stack((FX2, FY2))
-    else:
-        FP1 = []
-        FP2 = []
 
-    return FP1, FP2, SKInds
+def getTangentPointsContour(X, Y, R, branchStarts):
+    """
+    Computes the tangent points of all pairs of consecutive skeleton points of all branches.
 
+    For every pair, the radius of both points is perturbed by -0.1, 0 and +0.1, which gives
+    nine circle pairs and eighteen tangent points per pair.
+
+    Args:
+        X (numpy.ndarray): The x-coordinates of the points of all branches.
+        Y (numpy.ndarray): The y-coordinates of the points of all branches.
+        R (numpy.ndarray): The radius values of the points of all branches.
+        branchStarts (numpy.ndarray): Offsets of the branches, one more than there are branches.
+
+    Returns:
+        tuple: A tuple (FP, SKInds) where:
+            FP (numpy.ndarray): An (M, 2) array with the (x, y) coordinates of the tangent points.
+            Tangent points that do not exist (circles inside each other) are left out.
+            SKInds (numpy.ndarray): For every tangent point, the index into X, Y and R of
+            the first skeleton point of its pair.
+    """
+    N = len(X)
+    branchOf = np.repeat(np.arange(len(branchStarts) - 1), np.diff(branchStarts))
+    first = np.flatnonzero(branchOf[:-1] == branchOf[1:]) if N > 1 else np.zeros(0, dtype=np.intp)
+    second = first + 1
+
+    perturbation = np.array([-0.1, 0, 0.1])
+    shape = (len(first), 3, 3)
+    r1 = np.broadcast_to(R[first][:, None, None] + perturbation[None, :, None], shape)
+    r2 = np.broadcast_to(R[second][:, None, None] + perturbation[None, None, :], shape)
+    FX1, FY1, FX2, FY2 = getIntersectionTangents(X[first][:, None, None], Y[first][:, None, None], r1,
+                                                 X[second][:, None, None], Y[second][:, None, None], r2)
+    SKInds = np.broadcast_to(first[:, None, None], shape).ravel()
+
+    FP = np.concatenate((np.column_stack((FX1.ravel(), FY1.ravel())),
+                         np.column_stack((FX2.ravel(), FY2.ravel()))))
+    SKInds = np.concatenate((SKInds, SKInds))
+    exists = np.isfinite(FP).all(axis=1)
+    return FP[exists], SKInds[exists]
 
 
 def mapMATtoContour(skeletalBranches, imgLD, skeletonImageWithRating):
@@ -119,7 +100,8 @@ def mapMATtoContour(skeletalBranches, imgLD, skeletonImageWithRating):
     function computes the maximum of the two scores for mapping.
 
     Args:
-        skeletalBranches: Branches traced from the skeleton representation.
+        skeletalBranches: Branches traced from the skeleton representation, either a list of
+            branches or a SkeletonGraph.
         imgLD (numpy.ndarray): The binary line drawing image.
         skeletonImageWithRating (numpy.ndarray): The 2D matrix of the skeleton image with MAT-based scores.
 
@@ -132,6 +114,10 @@ def mapMATtoContour(skeletalBranches, imgLD, skeletonImageWithRating):
       of a line drawing.
     - If there are two medial axis branches around a line drawing contour, the function chooses the 
       maximum score between the two for mapping.
+    - The tangent points of all branches are generated at once and put into a single KD-tree. One
+      query finds all tangent points within neigh_radius of every contour pixel; for every pixel
+      and branch the nearest of these points supplies the score, and the pixel gets the maximum.
+      Among equally near tangent points of a branch, the one with the highest score is used.
 
     -----------------------------------------------------
     This function is part of the Mid Level Vision Toolbox:
@@ -161,31 +147,42 @@ def mapMATtoContour(skeletalBranches, imgLD, skeletonImageWithRating):
         imgLD = imgLD[:,:,0]
 
     imsize = imgLD.shape
-    imgLDInds = np.where(imgLD == 0)
-    contourXY = np.column_stack(imgLDInds)
-
+    contourY, contourX = np.where(imgLD == 0)
+    contourXY = np.column_stack((contourX, contourY))
     contourImageWithRating = np.zeros(imsize)
 
-    for i in range(len(skeletalBranches)):
-        cur_contour = skeletalBranches[i] # Verify this
-        FP1, FP2, SKInds = getTangentPointsContour(cur_contour, imsize)
-        FP = np.vstack((FP1, FP2))
-        AllSKInds = np.vstack((SKInds, SKInds))
-        neigh_radius = 4
-        if len(FP) > 0:
-            # Create a KDTree
-            tree = cKDTree(FP)
-            # Find the nearest neighbors
-            D, IDX = tree.query(contourXY, k=1)
-
-            # IDX, D = knnsearch(FP,contourXY) # Verify this
-            T = np.where(D < neigh_radius) # Verify this
-            if len(T) > 0:
-                reconstrucedInds = imgLDInds(T)
-                currentScores = contourImageWithRating[reconstrucedInds]
-                newScores = skeletonImageWithRating[AllSKInds(IDX(T))]
-                contourImageWithRating[reconstrucedInds] = np.maximum(currentScores, newScores)
-
+    if isinstance(skeletalBranches, SkeletonGraph):
+        X, Y, R = skeletalBranches.X, skeletalBranches.Y, skeletalBranches.R
+        branchStarts = skeletalBranches.edgeStarts
+    else:
+        lengths = [len(branch['X']) for branch in skeletalBranches]
+        branchStarts = np.concatenate(([0], np.cumsum(lengths, dtype=np.int64)))
+        if len(skeletalBranches) == 0:
+            return contourImageWithRating
+        X, Y, R = [np.concatenate([np.asarray(branch[key]) for branch in skeletalBranches])
+                   for key in ('X', 'Y', 'R')]
+
+    FP, SKInds = getTangentPointsContour(X, Y, R, branchStarts)
+    if len(FP) == 0 or len(contourXY) == 0:
+        return contourImageWithRating
+    pointBranch = np.repeat(np.arange(len(branchStarts) - 1), np.diff(branchStarts))[SKInds]
+    pointScore = skeletonImageWithRating[Y[SKInds], X[SKInds]]
+    tree = cKDTree(FP)
+
+    for start in range(0, len(contourXY), QUERY_CHUNK):
+        chunk = contourXY[start:start + QUERY_CHUNK]
+        pairs = cKDTree(chunk).sparse_distance_matrix(tree, neigh_radius, output_type='ndarray')
+        pairs = pairs[pairs['v'] < neigh_radius]
+        pixel, point, D = pairs['i'], pairs['j'], pairs['v']
+        # The nearest tangent point of every branch near a pixel, the best one among equally near points
+        order = np.lexsort((-pointScore[point], D, pointBranch[point], pixel))
+        pixel, point = pixel[order], point[order]
+        nearest = np.ones(len(pixel), dtype=bool)
+        nearest[1:] = (pixel[1:] != pixel[:-1]) | (pointBranch[point[1:]] != pointBranch[point[:-1]])
+        pixel, point = pixel[nearest], point[nearest]
+        # The maximum over the branches
+        scores = np.zeros(len(chunk))
+        np.maximum.at(scores, pixel, pointScore[point])
+        contourImageWithRating[chunk[:, 1], chunk[:, 0]] = scores
 
     return contourImageWithRating
-
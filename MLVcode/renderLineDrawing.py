@@ -0,0 +1,78 @@
+import numpy as np
+import cv2
+
+def renderLineDrawing(vecLD, imsize=None, lineWidth=1, out=None):
+    """
+    Renders a vectorized line drawing into a binary image, as used by computeMAT.
+
+    The contours are drawn in black (0) on a white (255) background. All line segments of all
+    contours of a drawing are drawn with a single call to cv2.polylines. The pixels of the lines
+    are those that MATpropertiesToContours reads the MAT properties from.
+
+    Args:
+        vecLD (dict or list): A vectorized line drawing structure, or a list of them to be
+            rendered into one stack of images.
+        imsize (tuple, optional): The size (width, height) of the output image, in the order of
+            vecLD['imsize']. If it differs from vecLD['imsize'], the drawing is scaled to it.
+            Default is None (vecLD['imsize']; all drawings of a list need to have the same size).
+        lineWidth (int, optional): The width of the contour lines in pixels. Default is 1.
+        out (numpy.ndarray, optional): A preallocated uint8 array to render into, of shape
+            (height, width) for one drawing or (N, height, width) for a list of N drawings. Its
+            content is overwritten. Default is None (a new array is allocated).
+
+    Returns:
+        numpy.ndarray: The uint8 image of shape (height, width), or the stack of images of
+        shape (N, height, width) for a list of drawings.
+
+    Raises:
+        ValueError: If the drawings of a list differ in size and no imsize is given, or if out
+        does not have the shape of the output.
+
+    -----------------------------------------------------
+    This function is part of the Mid Level Vision Toolbox:
+    http://www.mlvtoolbox.org
+
+    Python Implementation: Aravind Narayanan
+    Original MATLAB Implementation: Dirk Bernhardt-Walther
+    Copyright: Dirk Bernhardt-Walther
+    University of Toronto, Toronto, Ontario, Canada, 2024
+
+    Contact: dirk.walther@gmail.com
+    -----------------------------------------------------
+    """
+    vecLDs = [vecLD] if isinstance(vecLD, dict) else vecLD
+    if imsize is None:
+        sizes = {tuple(int(s) for s in np.asarray(ld['imsize']).ravel()[:2]) for ld in vecLDs}
+        if len(sizes) > 1:
+            raise ValueError('The drawings differ in size, imsize needs to be given')
+        imsize = sizes.pop() if sizes else (0, 0)
+    width, height = int(imsize[0]), int(imsize[1])
+
+    shape = (height, width) if isinstance(vecLD, dict) else (len(vecLDs), height, width)
+    if out is None:
+        out = np.empty(shape, dtype=np.uint8)
+    elif out.shape != shape or out.dtype != np.uint8:
+        raise ValueError(f'out needs to be a uint8 array of shape {shape}')
+    out[...] = 255
+
+    for l, ld in enumerate(vecLDs):
+        img = out if isinstance(vecLD, dict) else out[l]
+        segments = getScaledSegments(ld, (width, height))
+        if len(segments) > 0:
+            cv2.polylines(img, list(segments.reshape((-1, 2, 2))), isClosed=False,
+                          color=(0,), thickness=int(lineWidth))
+    return out
+
+
+def getScaledSegments(vecLD, imsize):
+    """
+    Returns the line segments of all contours of a drawing as an (S, 4) int32 array of
+    x1, y1, x2, y2, scaled from vecLD['imsize'] to imsize (width, height) and truncated to
+    pixels like in MATpropertiesToContours.
+    """
+    contours = [np.asarray(c, dtype=float).reshape((-1, 4)) for c in vecLD['contours'][0]]
+    if len(contours) == 0:
+        return np.zeros((0, 4), dtype=np.int32)
+    ldWidth, ldHeight = np.asarray(vecLD['imsize'], dtype=float).ravel()[:2]
+    scaleVec = np.array([imsize[0] / ldWidth, imsize[1] / ldHeight] * 2)
+    return (np.concatenate(contours) * scaleVec).astype(np.int32)
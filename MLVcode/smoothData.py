@@ -0,0 +1,50 @@
+import numpy as np
+
+def smoothData(A, method='movmean', window=3):
+    """
+    Smooths a vector with a moving mean, like MATLAB's smoothdata(A, 'movmean', window).
+
+    The window is centered on each element. For an even window size it covers window/2
+    elements before and window/2 - 1 elements after the element. Near the ends of the vector
+    the window shrinks to the elements that exist, as in MATLAB. All means are computed at
+    once from the prefix sums of A, so the cost does not depend on the window size.
+
+    Args:
+        A (array_like): The data to smooth, a vector or a scalar.
+        method (str, optional): The smoothing method. Only 'movmean' (also spelled 'movemean')
+        is supported. Default is 'movmean'.
+        window (int, optional): The size of the moving window. Default is 3. MATLAB picks the
+        window from the data when it is omitted; this heuristic is not reproduced here.
+
+    Returns:
+        numpy.ndarray: The smoothed data, a float vector of the same length as A.
+
+    Raises:
+        ValueError: If method is not supported or window is not positive.
+
+    -----------------------------------------------------
+    This function is part of the Mid Level Vision Toolbox:
+    http://www.mlvtoolbox.org
+
+    Python Implementation: Aravind Narayanan
+    Original MATLAB Implementation: Dirk Bernhardt-Walther
+    Copyright: Dirk Bernhardt-Walther
+    University of Toronto, Toronto, Ontario, Canada, 2024
+
+    Contact: dirk.walther@gmail.com
+    -----------------------------------------------------
+    """
+    if method not in ('movmean', 'movemean'):
+        raise ValueError('Unknown smoothing method: ' + str(method))
+    if window < 1:
+        raise ValueError('The window size has to be positive')
+
+    A = np.atleast_1d(np.asarray(A, dtype=float)).ravel()
+    N = len(A)
+    before = int(window) // 2
+    after = int(window) - 1 - before
+    prefix = np.concatenate(([0.0], np.cumsum(A)))
+    index = np.arange(N)
+    first = np.maximum(index - before, 0)
+    last = np.minimum(index + after, N - 1)
+    return (prefix[last + 1] - prefix[first]) / (last - first + 1)
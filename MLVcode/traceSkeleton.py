@@ -1,7 +1,7 @@
 import numpy as np
-import cv2
-import matplotlib.pyplot as plt
-from GetConSeg import GetConSeg # Need to add
+from scipy import ndimage
+from skimage import morphology
+from MLVcode.InitializeNeighborhoods import InitializeNeighborhoods
 
 def traceSkeleton(MAT):
     """
@@ -11,10 +11,11 @@ def traceSkeleton(MAT):
     - MAT: The given MAT data structure.
 
     Returns:
-    - allBranches: A dictionary that includes all branches computed from MAT.
+    - allBranches: A list with one dictionary per branch computed from MAT.
                    This includes the X and Y position of each branch point as well as the
                    Radius value (radius function) and the average outward flux value (AOF)
-                   along each branch.
+                   along each branch. The arrays of all branches are views into four
+                   contiguous arrays, in the order of the branches.
 
     Note:
     -----------------------------------------------------
@@ -29,18 +30,211 @@ def traceSkeleton(MAT):
     Contact: dirk.walther@gmail.com
     -----------------------------------------------------
     """
-    SegList = GetConSeg(MAT['skeleton'])
+    # Branches are traced on the one pixel wide skeleton
+    skeleton = morphology.skeletonize(np.asarray(MAT['skeleton']) != 0)
+    Y, X, branchStarts = traceSkeletonPixels(skeleton)
+    R = np.asarray(MAT['distance_map'])[Y, X]
+    F = np.asarray(MAT['AOF'])[Y, X]
     allBranches = []
 
-    for i in range(len(SegList)):
-        XY = SegList[i]
-        X = XY[:, 0]
-        Y = XY[:, 1]
-        C = np.ravel_multi_index((Y, X), MAT['skeleton'].shape)
+    for i in range(len(branchStarts) - 1):
+        branch = slice(branchStarts[i], branchStarts[i + 1])
+        allBranches.append({'X': X[branch], 'Y': Y[branch], 'R': R[branch], 'F': F[branch]})
 
-        R = MAT['distance_map'][C]
-        F = MAT['AOF'][C]
-        branch = {'X': X, 'Y': Y, 'R': R, 'F': F}
-        allBranches.append(branch)
+    return allBranches
 
-    return allBranches
\ No newline at end of file
+
+def traceSkeletonPixels(skeleton, returnNodeLabels=False):
+    """
+    Splits a skeleton image into branches in a single pass over the skeleton pixels.
+
+    Every skeleton pixel is classified by the number of skeleton pixels in its
+    8-neighborhood: endpoints have one neighbor, junctions three or more, and all other
+    pixels continue a branch with exactly two neighbors. Adjacent junction pixels form one
+    junction. A branch runs from an endpoint or a junction pixel through the continuing
+    pixels up to the next endpoint or junction pixel, which are both part of the branch.
+    Closed loops without endpoints or junctions become one branch each, as do isolated pixels.
+
+    A branch that ends in a junction is continued through the junction up to its center pixel
+    (see getJunctionCenterPaths), so that the branches meeting at a junction share its center.
+    Junction pixels that are still on no branch then get a branch of their own up to the
+    center. Every skeleton pixel is thus part of at least one branch.
+
+    Args:
+        skeleton (numpy.ndarray): A binary image with a one pixel wide skeleton.
+        returnNodeLabels (bool, optional): If True, the node labels of labelSkeletonNodes are
+        returned as well. Default is False.
+
+    Returns:
+        tuple: A tuple (Y, X, branchStarts), or (Y, X, branchStarts, nodeLabels), where:
+            Y (numpy.ndarray): The row of every branch pixel, all branches one after the other.
+            X (numpy.ndarray): The column of every branch pixel.
+            branchStarts (numpy.ndarray): An int64 array with one more entry than there are
+            branches. Branch i consists of the pixels branchStarts[i]:branchStarts[i+1].
+            nodeLabels (numpy.ndarray): The node labels of the skeleton pixels, as computed
+            by labelSkeletonNodes.
+    """
+    skeleton = np.asarray(skeleton) != 0
+    m, n = skeleton.shape
+    # Pad by one pixel so that all 8 neighbors of a skeleton pixel exist
+    padded = np.zeros((m + 2, n + 2), dtype=bool)
+    padded[1:m + 1, 1:n + 1] = skeleton
+    isSkeleton = padded.ravel()
+    neighborOffsets = InitializeNeighborhoods() @ np.array([n + 2, 1])
+
+    nodeLabels, neighborCount = labelSkeletonNodes(padded)
+    nodeLabels = nodeLabels.ravel()
+    neighborCount = neighborCount.ravel()
+    pixels = np.flatnonzero(isSkeleton)
+    isNode = nodeLabels > 0
+
+    # The two neighbors of every continuing pixel
+    continuing = pixels[~isNode[pixels]]
+    neighbors = np.full((len(isSkeleton), 2), -1, dtype=np.int64)
+    found = np.zeros(len(continuing), dtype=np.intp)
+    for offset in neighborOffsets:
+        hit = isSkeleton[continuing + offset]
+        neighbors[continuing[hit], found[hit]] = continuing[hit] + offset
+        found += hit
+
+    visited = np.zeros(isSkeleton.shape, dtype=bool)
+    path = []
+    branchStarts = [0]
+
+    def walk(previous, current):
+        # Follows the continuing pixels from current, coming from previous, up to a node
+        while not isNode[current] and not visited[current]:
+            visited[current] = True
+            path.append(current)
+            first, second = neighbors[current]
+            previous, current = current, (second if first == previous else first)
+        if isNode[current]:
+            path.append(current)
+
+    for pixel in pixels[isNode[pixels]]:
+        if neighborCount[pixel] == 0:
+            path.append(pixel)
+            branchStarts.append(len(path))
+            continue
+        for offset in neighborOffsets:
+            neighbor = pixel + offset
+            if not isSkeleton[neighbor]:
+                continue
+            if isNode[neighbor]:
+                # Two adjacent nodes form a branch of their own, unless they belong to
+                # the same junction; it is traced once, from the first of the two pixels
+                if neighbor < pixel or nodeLabels[pixel] == nodeLabels[neighbor]:
+                    continue
+                path.extend((pixel, neighbor))
+            elif visited[neighbor]:
+                continue
+            else:
+                path.append(pixel)
+                walk(pixel, neighbor)
+            branchStarts.append(len(path))
+
+    # What remains are closed loops
+    for pixel in continuing[~visited[continuing]]:
+        if visited[pixel]:
+            continue
+        walk(neighbors[pixel, 0], pixel)
+        branchStarts.append(len(path))
+
+    # Continue the branches through their junctions up to the center pixels
+    isJunction = isNode & (neighborCount > 2)
+    toCenter = getJunctionCenterPaths(isJunction, nodeLabels, neighborOffsets, n + 2)
+    branches = [path[start:stop] for start, stop in zip(branchStarts[:-1], branchStarts[1:])]
+    path = []
+    branchStarts = [0]
+    for branch in branches:
+        if isJunction[branch[0]]:
+            path.extend(reversed(toCenter[branch[0]]))
+        path.extend(branch)
+        if isJunction[branch[-1]]:
+            path.extend(toCenter[branch[-1]])
+        branchStarts.append(len(path))
+    covered = np.zeros(isSkeleton.shape, dtype=bool)
+    covered[path] = True
+    for pixel in np.flatnonzero(isJunction & ~covered):
+        if covered[pixel]:
+            continue
+        path.append(pixel)
+        path.extend(toCenter[pixel])
+        covered[path[branchStarts[-1]:]] = True
+        branchStarts.append(len(path))
+
+    Y, X = np.divmod(np.array(path, dtype=np.int64), n + 2)
+    branchStarts = np.array(branchStarts, dtype=np.int64)
+    if returnNodeLabels:
+        return Y - 1, X - 1, branchStarts, nodeLabels.reshape(padded.shape)[1:m + 1, 1:n + 1]
+    return Y - 1, X - 1, branchStarts
+
+
+def getJunctionCenterPaths(isJunction, nodeLabels, neighborOffsets, width):
+    """
+    Finds for every junction pixel the shortest path within its junction to the center pixel
+    of the junction, the pixel closest to the mean position of its pixels (the first one in
+    row-major order on a tie).
+
+    Args:
+        isJunction (numpy.ndarray): Flat boolean array that is True for the junction pixels.
+        nodeLabels (numpy.ndarray): Flat node labels of labelSkeletonNodes, in the same layout.
+        neighborOffsets (numpy.ndarray): The offsets of the 8 neighbors in the flat layout,
+        which has to have a border of non-skeleton pixels.
+        width (int): The number of columns of the image in the flat layout.
+
+    Returns:
+        dict: The pixels after each junction pixel on its path to the center, ending with the
+        center, and an empty list for the center itself.
+    """
+    junctionPixels = np.flatnonzero(isJunction)
+    labels = nodeLabels[junctionPixels]
+    order = np.argsort(labels, kind='stable')
+    junctionPixels, labels = junctionPixels[order], labels[order]
+    starts = np.flatnonzero(np.diff(labels, prepend=-1) != 0).tolist() + [len(labels)]
+    toCenter = {}
+    for start, stop in zip(starts[:-1], starts[1:]):
+        pixels = junctionPixels[start:stop]
+        rows, cols = np.divmod(pixels, width)
+        center = int(pixels[np.argmin((rows - rows.mean())**2 + (cols - cols.mean())**2)])
+        # Breadth-first search from the center within the junction
+        toCenter[center] = []
+        queue = [center]
+        for pixel in queue:
+            for offset in neighborOffsets:
+                neighbor = pixel + int(offset)
+                if neighbor not in toCenter and isJunction[neighbor] and nodeLabels[neighbor] == nodeLabels[pixel]:
+                    toCenter[neighbor] = [pixel] + toCenter[pixel]
+                    queue.append(neighbor)
+    return toCenter
+
+
+def labelSkeletonNodes(skeleton):
+    """
+    Labels the endpoints and junctions of a one pixel wide skeleton.
+
+    Pixels with exactly two skeleton pixels in their 8-neighborhood continue a branch and
+    are not labeled. Pixels with three or more neighbors are junction pixels, and adjacent
+    junction pixels share the label of their junction. Each remaining skeleton pixel, an
+    endpoint with one neighbor or an isolated pixel, gets a label of its own. Junctions are
+    labeled first, then the endpoints and isolated pixels in row-major order.
+
+    Args:
+        skeleton (numpy.ndarray): A binary image with a one pixel wide skeleton.
+
+    Returns:
+        tuple: A tuple (nodeLabels, neighborCount) where:
+            nodeLabels (numpy.ndarray): An integer image with the node labels 1, 2, ... and 0
+            for all other pixels.
+            neighborCount (numpy.ndarray): The number of skeleton pixels in the 8-neighborhood
+            of every pixel.
+    """
+    skeleton = np.asarray(skeleton) != 0
+    kernel = np.ones((3, 3), dtype=np.uint8)
+    kernel[1, 1] = 0
+    neighborCount = ndimage.convolve(skeleton.astype(np.uint8), kernel, mode='constant')
+    isJunction = skeleton & (neighborCount > 2)
+    nodeLabels, numJunctions = ndimage.label(isJunction, structure=np.ones((3, 3), dtype=bool))
+    isEnd = skeleton & (neighborCount < 2)
+    nodeLabels[isEnd] = numJunctions + 1 + np.arange(np.count_nonzero(isEnd))
+    return nodeLabels, neighborCount